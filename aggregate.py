@@ -0,0 +1,157 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# The aggregate model of graph_revenue.py and graph_clv.py, which counts customers instead of
+# tracking them one by one (compare revenue.py). simulate_batch is the model; simulate_scalar
+# repeats its month loop for dual numbers only.
+
+# Constants
+BASELINE_FEE = 100
+ORGANIC_CUSTOMERS = 25
+BASE_CHURN_RATE = 0.1
+BASE_CSAT = 70
+CSAT_IMPROVEMENT = 1
+NEW_CUSTOMERS_PER_SALESPERSON = 5
+CUSTOMERS_PER_ACCOUNT_MANAGER = 25
+REVENUE_INCREASE_RATE = 0.2
+CSAT_CHURN_REDUCTION = 0.15
+
+# The constants as a parameter set
+Parameters = namedtuple("Parameters", ["BASELINE_FEE", "ORGANIC_CUSTOMERS", "BASE_CHURN_RATE", "BASE_CSAT", "CSAT_IMPROVEMENT",
+                                       "NEW_CUSTOMERS_PER_SALESPERSON", "CUSTOMERS_PER_ACCOUNT_MANAGER",
+                                       "REVENUE_INCREASE_RATE", "CSAT_CHURN_REDUCTION"])
+
+DEFAULT_PARAMETERS = Parameters(BASELINE_FEE, ORGANIC_CUSTOMERS, BASE_CHURN_RATE, BASE_CSAT, CSAT_IMPROVEMENT,
+                                NEW_CUSTOMERS_PER_SALESPERSON, CUSTOMERS_PER_ACCOUNT_MANAGER,
+                                REVENUE_INCREASE_RATE, CSAT_CHURN_REDUCTION)
+
+# Calculate the churn rate based on CSAT
+# def calculate_churn_rate(csat_score):
+#     return BASE_CHURN_RATE * (0.85 ** (csat_score - BASE_CSAT))
+
+def calculate_churn_rate(csat_score, parameters=DEFAULT_PARAMETERS):
+    return parameters.BASE_CHURN_RATE * ((1-parameters.CSAT_CHURN_REDUCTION) ** (csat_score - 70))
+
+
+# assumption that churn rate is 10% and CSAT score is 70
+
+# Calculate revenue from account-managed customers
+def calculate_account_manager_revenue(managed_customer_count, months_managed, parameters=DEFAULT_PARAMETERS):
+    month = min(months_managed, 6)
+    total_revenue = managed_customer_count * parameters.BASELINE_FEE * (1 + parameters.REVENUE_INCREASE_RATE) ** month
+    return total_revenue
+
+def calculate_clv(arpu, customer_churn_rate):
+    avg_revenue_of_churned_customers = 100
+    
+    # Calculate Revenue Churn Rate
+    revenue_churn_rate = customer_churn_rate * (avg_revenue_of_churned_customers / arpu)
+    # Calculate Customer Lifetime (in months)
+    customer_lifetime = 1 / revenue_churn_rate    
+    # Calculate CLV
+    clv = arpu * customer_lifetime
+    
+    return clv
+
+# Everything one simulation of the allocations produces
+SimulationResult = namedtuple("SimulationResult", ["cumulative_revenue", "monthly_revenue", "monthly_clv", "avg_clv",
+                                                   "monthly_churn", "monthly_customers"])
+
+# Simulate plans under parameter sets, vectorized over both: allocations has shape (..., months, 3)
+# and every constant of parameters is a number or an array (see parameters.py); the leading
+# shape of the allocations and the shapes of the constants are broadcast into the batch shape,
+# e.g. (population, 1, months, 3) plans under (sets,) constants give a (population, sets) batch.
+# Every series in the result has shape (*batch, months) and the totals have the batch shape;
+# without monthly only the totals are kept and the series are None.
+def simulate_batch(allocations, parameters=DEFAULT_PARAMETERS, monthly=True):
+    allocations = np.asarray(allocations, dtype=np.float64)
+    number_of_months = allocations.shape[-2]
+    batch = np.broadcast_shapes(allocations.shape[:-2], *(np.shape(value) for value in parameters))
+    initial_customer_base = 1000
+    current_csat_score = parameters.BASE_CSAT
+    cumulative_revenue = np.zeros(batch)
+    clv_total = np.zeros(batch)
+    monthly_revenues, clv_arr, churn_arr, customers_arr = ([np.empty(batch + (number_of_months,)) for _ in range(4)]
+                                                            if monthly else [None] * 4)
+    
+    current_customer_base = np.full(batch, initial_customer_base, dtype=np.float64)
+    
+    for month_index in range(number_of_months):
+        new_business_team_members, account_managers, support_agents = np.moveaxis(allocations[..., month_index, :], -1, 0)
+        
+        # Calculate new customers acquired
+        new_customer_count = parameters.ORGANIC_CUSTOMERS + new_business_team_members * parameters.NEW_CUSTOMERS_PER_SALESPERSON
+        
+        # Calculate churn rate and churned customers
+        churn_rate = calculate_churn_rate(current_csat_score + support_agents * parameters.CSAT_IMPROVEMENT, parameters)
+        churned_customer_count = np.trunc(current_customer_base * churn_rate)
+        
+        # Calculate the number of customers managed by account managers
+        managed_customer_count = np.trunc(np.minimum(current_customer_base - churned_customer_count, parameters.CUSTOMERS_PER_ACCOUNT_MANAGER * account_managers))
+        
+        # Calculate monthly revenue
+        revenue_from_existing_customers = (current_customer_base + new_customer_count - churned_customer_count - managed_customer_count) * parameters.BASELINE_FEE
+        revenue_from_managed_customers = calculate_account_manager_revenue(managed_customer_count, month_index + 1, parameters)
+        
+        monthly_revenue = revenue_from_existing_customers + revenue_from_managed_customers
+        cumulative_revenue += monthly_revenue
+        
+        # Update customer base and CSAT for the next month
+        current_customer_base = current_customer_base - churned_customer_count + new_customer_count
+
+        monthly_clv = calculate_clv(monthly_revenue/current_customer_base, churn_rate)
+        clv_total += monthly_clv
+        if monthly:
+            monthly_revenues[..., month_index] = monthly_revenue
+            clv_arr[..., month_index] = monthly_clv
+            churn_arr[..., month_index] = churned_customer_count
+            customers_arr[..., month_index] = current_customer_base
+    return SimulationResult(cumulative_revenue, monthly_revenues, clv_arr, clv_total/number_of_months,
+                            churn_arr, customers_arr)
+
+# The same month loop on plain Python numbers for one plan and one parameter set, for the dual
+# numbers of dual.py, which do not go through numpy's float kernels; the series are lists
+def simulate_scalar(monthly_allocations, parameters=DEFAULT_PARAMETERS):
+    number_of_months = len(monthly_allocations)
+    initial_customer_base = 1000
+    current_csat_score = parameters.BASE_CSAT
+    cumulative_revenue = 0
+    monthly_revenues = []
+    clv_arr = []
+    churn_arr = []
+    customers_arr = []
+    
+    current_customer_base = initial_customer_base
+    
+    for month_index in range(number_of_months):
+        new_business_team_members, account_managers, support_agents = monthly_allocations[month_index]
+        
+        # Calculate new customers acquired
+        new_customer_count = parameters.ORGANIC_CUSTOMERS + new_business_team_members * parameters.NEW_CUSTOMERS_PER_SALESPERSON
+        
+        # Calculate churn rate and churned customers
+        churn_rate = calculate_churn_rate(current_csat_score + support_agents * parameters.CSAT_IMPROVEMENT, parameters)
+        churned_customer_count = math.trunc(current_customer_base * churn_rate)
+        
+        # Calculate the number of customers managed by account managers
+        managed_customer_count = math.trunc(min(current_customer_base - churned_customer_count, parameters.CUSTOMERS_PER_ACCOUNT_MANAGER * account_managers))
+       
+        # Calculate monthly revenue
+        revenue_from_existing_customers = (current_customer_base + new_customer_count - churned_customer_count - managed_customer_count) * parameters.BASELINE_FEE
+        revenue_from_managed_customers = calculate_account_manager_revenue(managed_customer_count, month_index + 1, parameters)
+        
+        monthly_revenue = revenue_from_existing_customers + revenue_from_managed_customers 
+        cumulative_revenue += monthly_revenue
+        
+        # Update customer base and CSAT for the next month
+        current_customer_base = current_customer_base - churned_customer_count + new_customer_count
+
+        monthly_clv = calculate_clv(monthly_revenue/current_customer_base, churn_rate)
+        monthly_revenues.append(monthly_revenue)
+        clv_arr.append(monthly_clv)
+        churn_arr.append(churned_customer_count)
+        customers_arr.append(current_customer_base)
+    return SimulationResult(cumulative_revenue, monthly_revenues, clv_arr, sum(clv_arr)/len(clv_arr),
+                            churn_arr, customers_arr)
@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+from planner import month_allocations
+from revenue import calculate_cumulative_revenue, evaluate_allocations
+
+NUM_MONTHS = 24
+TOTAL_EMPLOYEES = 20
+
+# Every valid (new_business, account_managers, support) split; a population is a
+# (population, months) uint8 array of indices into it
+MONTH_ALLOCATIONS = month_allocations(TOTAL_EMPLOYEES)
+
+# Index of the split for each (new_business, account_managers) pair
+SPLIT_INDEX = np.full((TOTAL_EMPLOYEES + 1, TOTAL_EMPLOYEES + 1), -1, dtype=np.int64)
+SPLIT_INDEX[MONTH_ALLOCATIONS[:, 0], MONTH_ALLOCATIONS[:, 1]] = np.arange(len(MONTH_ALLOCATIONS))
+
+# Random population drawn like optimizer.create_month_allocation: new business first,
+# then account managers from what is left, support gets the rest
+def random_population(size, months, rng):
+    new_business = rng.integers(0, TOTAL_EMPLOYEES + 1, size=(size, months))
+    account_managers = rng.integers(0, TOTAL_EMPLOYEES - new_business + 1)
+    return SPLIT_INDEX[new_business, account_managers].astype(np.uint8)
+
+# Convert between index populations and (population, months, 3) allocations
+def to_allocations(population):
+    return MONTH_ALLOCATIONS[population]
+
+def from_allocations(allocations):
+    allocations = np.asarray(allocations, dtype=np.int64)
+    return SPLIT_INDEX[allocations[..., 0], allocations[..., 1]].astype(np.uint8)
+
+# Cumulative revenue of every individual, simulating each distinct plan once
+def evaluate_array(population):
+    unique_plans, inverse = np.unique(population, axis=0, return_inverse=True)
+    cumulative_revenues, _, _ = evaluate_allocations(to_allocations(unique_plans))
+    return cumulative_revenues[inverse.reshape(-1)], len(unique_plans)
+
+# Tournament selection, like tools.selTournament: returns the indices of the winners
+def select_tournament(fitnesses, k, tournsize, rng):
+    aspirants = rng.integers(0, len(fitnesses), size=(k, tournsize))
+    return aspirants[np.arange(k), np.argmax(fitnesses[aspirants], axis=1)]
+
+# Two-point crossover, like tools.cxTwoPoint, between rows 2i and 2i+1 where mate is set
+def crossover_two_point(population, mate, rng):
+    first, second = population[0:-1:2][mate], population[1::2][mate]
+    months = population.shape[1]
+    cxpoint1 = rng.integers(1, months + 1, size=len(first))
+    cxpoint2 = rng.integers(1, months, size=len(first))
+    cxpoint2 = np.where(cxpoint2 >= cxpoint1, cxpoint2 + 1, cxpoint2)
+    cxpoint1, cxpoint2 = np.minimum(cxpoint1, cxpoint2), np.maximum(cxpoint1, cxpoint2)
+
+    columns = np.arange(months)
+    swap = (columns >= cxpoint1[:, None]) & (columns < cxpoint2[:, None])
+    population[0:-1:2][mate] = np.where(swap, second, first)
+    population[1::2][mate] = np.where(swap, first, second)
+
+# Shuffle mutation, like tools.mutShuffleIndexes, on the rows where mutate is set
+def mutate_shuffle_indexes(population, mutate, indpb, rng):
+    size, months = population.shape
+    rows = np.arange(size)
+    for month in range(months):
+        swapping = mutate & (rng.random(size) < indpb)
+        swap_month = rng.integers(0, months - 1, size=size)
+        swap_month = np.where(swap_month >= month, swap_month + 1, swap_month)
+        swapped = population[rows[swapping], swap_month[swapping]]
+        population[rows[swapping], swap_month[swapping]] = population[swapping, month]
+        population[swapping, month] = swapped
+
+# The eaSimple loop on an index population: tournament selection, then crossover of
+# consecutive pairs and mutation of single individuals, re-evaluating only changed ones
+def ea_simple_array(population, ngen, cxpb, mutpb, rng, tournsize=3, indpb=0.05, verbose=True):
+    fitnesses, nevals = evaluate_array(population)
+    if verbose:
+        print("gen\tnevals\tmax")
+        print(f"0\t{nevals}\t{fitnesses.max():,.2f}")
+
+    for gen in range(1, ngen + 1):
+        selected = select_tournament(fitnesses, len(population), tournsize, rng)
+        population = population[selected]
+        fitnesses = fitnesses[selected]
+        changed = np.zeros(len(population), dtype=bool)
+
+        mate = rng.random(len(population) // 2) < cxpb
+        crossover_two_point(population, mate, rng)
+        changed[0:-1:2][mate] = True
+        changed[1::2][mate] = True
+
+        mutate = rng.random(len(population)) < mutpb
+        mutate_shuffle_indexes(population, mutate, indpb, rng)
+        changed |= mutate
+
+        fitnesses[changed], nevals = evaluate_array(population[changed])
+        if verbose:
+            print(f"{gen}\t{nevals}\t{fitnesses.max():,.2f}")
+
+    return population, fitnesses
+
+if __name__ == "__main__":
+    start = time.time()
+    rng = np.random.default_rng(0)
+    population = random_population(100000, NUM_MONTHS, rng)
+    population, fitnesses = ea_simple_array(population, ngen=50, cxpb=0.7, mutpb=0.2, rng=rng)
+
+    best_ind = to_allocations(population[np.argmax(fitnesses)]).tolist()
+    best_revenue = calculate_cumulative_revenue(best_ind, NUM_MONTHS)[0]
+
+    print(f"Best allocation: {best_ind}")
+    print(f"Best cumulative revenue: {best_revenue}")
+    print(f"\nTotal cumulative revenue over {NUM_MONTHS} months: ${best_revenue:,.2f} ({time.time() - start:.1f}s)")
@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+
+# Forward-mode automatic differentiation: a Dual carries a value together with its gradient with
+# respect to every seeded input, and arithmetic on Duals carries both through the model. Running a
+# model on Duals therefore returns the result and all of its partial derivatives in one pass.
+class Dual:
+    __slots__ = ("value", "gradient")
+
+    def __init__(self, value, gradient):
+        self.value = value
+        self.gradient = gradient
+
+    def __repr__(self):
+        return f"Dual({self.value!r}, {self.gradient!r})"
+
+    def __float__(self):
+        return float(self.value)
+
+    # Customer counts are truncated to whole customers (math.trunc). The derivative is passed
+    # straight through, as if the counts stayed fractional; the truncated model is piecewise
+    # constant and would otherwise report a zero slope for anything that only moves counts.
+    def __trunc__(self):
+        return Dual(math.trunc(self.value), self.gradient)
+
+    def __neg__(self):
+        return Dual(-self.value, -self.gradient)
+
+    def __add__(self, other):
+        value, gradient = parts(other)
+        return Dual(self.value + value, self.gradient + gradient)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        value, gradient = parts(other)
+        return Dual(self.value - value, self.gradient - gradient)
+
+    def __rsub__(self, other):
+        value, gradient = parts(other)
+        return Dual(value - self.value, gradient - self.gradient)
+
+    def __mul__(self, other):
+        value, gradient = parts(other)
+        return Dual(self.value * value, self.gradient * value + self.value * gradient)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        value, gradient = parts(other)
+        return Dual(self.value / value, (self.gradient * value - self.value * gradient) / value ** 2)
+
+    def __rtruediv__(self, other):
+        value, gradient = parts(other)
+        return Dual(value / self.value, (gradient * self.value - value * self.gradient) / self.value ** 2)
+
+    def __pow__(self, other):
+        if not isinstance(other, Dual):
+            if other == 0:
+                return Dual(self.value ** 0, self.gradient * 0)
+            return Dual(self.value ** other, other * self.value ** (other - 1) * self.gradient)
+        result = self.value ** other.value
+        return Dual(result, other.value * self.value ** (other.value - 1) * self.gradient
+                    + result * math.log(self.value) * other.gradient)
+
+    def __rpow__(self, other):
+        result = other ** self.value
+        return Dual(result, result * math.log(other) * self.gradient)
+
+    # Comparisons (and so min and max) look at the values only
+    def __lt__(self, other):
+        return self.value < parts(other)[0]
+
+    def __le__(self, other):
+        return self.value <= parts(other)[0]
+
+    def __gt__(self, other):
+        return self.value > parts(other)[0]
+
+    def __ge__(self, other):
+        return self.value >= parts(other)[0]
+
+# Value and gradient of a Dual or a plain number (which has no gradient)
+def parts(number):
+    if isinstance(number, Dual):
+        return number.value, number.gradient
+    return number, 0
+
+# A parameter set (see parameters.py) and monthly allocations as Duals, every constant and every
+# allocation entry seeded with its own unit gradient: constants first, then the allocations month by month
+def seed_inputs(parameters, monthly_allocations):
+    unit_gradients = np.eye(len(parameters) + 3 * len(monthly_allocations))
+    dual_parameters = type(parameters)(*[Dual(value, unit_gradients[index]) for index, value in enumerate(parameters)])
+    dual_allocations = [[Dual(value, unit_gradients[len(parameters) + 3 * month + role]) for role, value in enumerate(allocation)]
+                        for month, allocation in enumerate(monthly_allocations)]
+    return dual_parameters, dual_allocations
+
+# Split the result of a model run on seed_inputs into its value, the partial derivatives with
+# respect to each constant (dict) and with respect to each allocation entry, shape (months, 3)
+def split_gradient(result, parameters, months):
+    gradient = np.broadcast_to(parts(result)[1], len(parameters) + 3 * months)
+    constant_gradients = {constant: float(gradient[index]) for index, constant in enumerate(parameters._fields)}
+    return float(parts(result)[0]), constant_gradients, gradient[len(parameters):].reshape(months, 3).copy()
@@ -0,0 +1,117 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+# Database of the evaluation cache shared by the scripts
+EVALUATION_CACHE_PATH = "graphs/data/evaluation_cache.sqlite"
+
+# Size cap of the database; once it is exceeded, the least recently used EVICTION_FRACTION of
+# the entries is deleted (freed pages are reused, so the file stops growing at about the cap)
+EVALUATION_CACHE_BYTES = 1024 * 1024 * 1024
+EVICTION_FRACTION = 0.1
+
+# Keys bound to one SQL statement at a time
+SQL_BATCH_SIZE = 500
+
+# Evaluations are keyed by a digest of (model version, parameter set, allocation) and store one
+# float64 array per metric, e.g. "cumulative_revenue" (one value) or "monthly_revenue" (one per
+# month). The cache is an SQLite database in WAL mode, so any number of processes can read while
+# one writes; every process opens its own connection.
+
+# Version of a model: a digest of the source file it is defined in, so editing the model
+# invalidates its cached evaluations
+def model_version(path):
+    with open(path, "rb") as file:
+        return hashlib.blake2b(file.read(), digest_size=8).hexdigest()
+
+# 16 byte key of an allocation evaluated by a model version under a parameter set (see
+# parameters.py; None for the model's built-in constants)
+def evaluation_key(model, parameters, allocation):
+    digest = hashlib.blake2b(model.encode(), digest_size=16)
+    if parameters is not None:
+        digest.update(np.asarray(parameters, dtype=np.float64).tobytes())
+    digest.update(b"|")
+    digest.update(np.ascontiguousarray(allocation, dtype=np.int32).tobytes())
+    return digest.digest()
+
+class EvaluationCache:
+    def __init__(self, path=EVALUATION_CACHE_PATH, max_bytes=EVALUATION_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = None
+        self.pid = None
+
+    # Connection of the current process, opened on first use (also after a fork)
+    def connect(self):
+        if self.connection is None or self.pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS entries (key BLOB, metric TEXT, value BLOB, last_used INTEGER, "
+                                    "PRIMARY KEY (key, metric)) WITHOUT ROWID")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self.pid = os.getpid()
+        return self.connection
+
+    # Cached values of a metric for keys, as {key: array}; hits count as used now
+    def get(self, keys, metric):
+        connection = self.connect()
+        values = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), SQL_BATCH_SIZE):
+            batch = unique_keys[start:start + SQL_BATCH_SIZE]
+            rows = connection.execute(f"SELECT key, value FROM entries WHERE metric = ? AND key IN ({','.join('?' * len(batch))})",
+                                      [metric] + batch).fetchall()
+            values.update((key, np.frombuffer(value, dtype=np.float64)) for key, value in rows)
+        if values:
+            now = time.time_ns()
+            with connection:
+                connection.executemany("UPDATE entries SET last_used = ? WHERE key = ? AND metric = ?",
+                                       [(now, key, metric) for key in values])
+        return values
+
+    # Store the values (one array or number per key) of a metric, then evict if over the size cap
+    def put(self, keys, metric, values):
+        connection = self.connect()
+        now = time.time_ns()
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                   [(key, metric, np.asarray(value, dtype=np.float64).tobytes(), now)
+                                    for key, value in zip(keys, values)])
+        self.evict()
+
+    def size(self):
+        connection = self.connect()
+        page_size, = connection.execute("PRAGMA page_size").fetchone()
+        page_count, = connection.execute("PRAGMA page_count").fetchone()
+        freelist_count, = connection.execute("PRAGMA freelist_count").fetchone()
+        return page_size * (page_count - freelist_count)
+
+    def evict(self):
+        connection = self.connect()
+        while self.size() > self.max_bytes:
+            entries, = connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+            if not entries:
+                return
+            with connection:
+                connection.execute("DELETE FROM entries WHERE (key, metric) IN (SELECT key, metric FROM entries "
+                                   "ORDER BY last_used LIMIT ?)", (max(1, int(entries * EVICTION_FRACTION)),))
+
+    # Values of the metrics for every key, as {metric: [array per key]}, evaluating only the keys
+    # that miss a metric: evaluate(indices) returns {metric: [array or number per index]} for the
+    # given positions in keys
+    def evaluate(self, keys, metrics, evaluate):
+        cached = {metric: self.get(keys, metric) for metric in metrics}
+        missing = sorted({index for index, key in enumerate(keys) if any(key not in cached[metric] for metric in metrics)})
+        if missing:
+            evaluated = evaluate(missing)
+            for metric in metrics:
+                values = [np.atleast_1d(np.asarray(value, dtype=np.float64)) for value in evaluated[metric]]
+                self.put([keys[index] for index in missing], metric, values)
+                cached[metric].update((keys[index], value) for index, value in zip(missing, values))
+        return {metric: [cached[metric][key] for key in keys] for metric in metrics}
@@ -1,117 +1,56 @@
-import plotly.graph_objs as go
-import plotly.offline as pyo
+import numpy as np
 
-# Constants
-BASELINE_FEE = 100
-ORGANIC_CUSTOMERS = 25
-BASE_CHURN_RATE = 0.1
-BASE_CSAT = 70
-CSAT_IMPROVEMENT = 1
-NEW_CUSTOMERS_PER_SALESPERSON = 5
-CUSTOMERS_PER_ACCOUNT_MANAGER = 25
-REVENUE_INCREASE_RATE = 0.2
-CSAT_CHURN_REDUCTION = 0.15
-
-# Calculate the churn rate based on CSAT
-# def calculate_churn_rate(csat_score):
-#     return BASE_CHURN_RATE * (0.85 ** (csat_score - BASE_CSAT))
-
-def calculate_churn_rate(csat_score):
-    return BASE_CHURN_RATE * ((1-CSAT_CHURN_REDUCTION) ** (csat_score - 70))
-
-
-# assumption that churn rate is 10% and CSAT score is 70
-
-# Calculate revenue from account-managed customers
-def calculate_account_manager_revenue(managed_customer_count, months_managed):
-    month = min(months_managed, 6)
-    total_revenue = managed_customer_count * BASELINE_FEE * (1 + REVENUE_INCREASE_RATE) ** month
-    return total_revenue
+from aggregate import DEFAULT_PARAMETERS, simulate_batch, simulate_scalar
+from dual import seed_inputs, split_gradient
+from parameters import perturbed_parameter_sets, stack_parameters
+from sensitivity import morris_elementary_effects, sobol_indices
 
 # Calculate cumulative revenue given allocations
-def calculate_cumulative_revenue(monthly_allocations):
-    number_of_months = len(monthly_allocations)
-    initial_customer_base = 1000
-    current_csat_score = BASE_CSAT
-    cumulative_revenue = 0
-    
-    current_customer_base = initial_customer_base
-    
-    for month_index in range(number_of_months):
-        new_business_team_members, account_managers, support_agents = monthly_allocations[month_index]
-        
-        # Calculate new customers acquired
-        new_customer_count = ORGANIC_CUSTOMERS + new_business_team_members * NEW_CUSTOMERS_PER_SALESPERSON
-        
-        # Calculate churn rate and churned customers
-        churn_rate = calculate_churn_rate(current_csat_score + support_agents * CSAT_IMPROVEMENT)
-        churned_customer_count = int(current_customer_base * churn_rate)
-        
-        # Calculate the number of customers managed by account managers
-        managed_customer_count = int(min(current_customer_base - churned_customer_count, CUSTOMERS_PER_ACCOUNT_MANAGER * account_managers))
-       
-        # Calculate monthly revenue
-        revenue_from_existing_customers = (current_customer_base + new_customer_count - churned_customer_count - managed_customer_count) * BASELINE_FEE
-        revenue_from_managed_customers = calculate_account_manager_revenue(managed_customer_count, month_index + 1)
-        
-        monthly_revenue = revenue_from_existing_customers + revenue_from_managed_customers 
-        
-        # Update cumulative revenue
-        cumulative_revenue += monthly_revenue
-        
-        # Update customer base and CSAT for the next month
-        current_customer_base = current_customer_base - churned_customer_count + new_customer_count
-    
-    return cumulative_revenue
+def calculate_cumulative_revenue(monthly_allocations, parameters=DEFAULT_PARAMETERS):
+    return simulate_batch(monthly_allocations, parameters).cumulative_revenue.item()
+
+# Cumulative revenue and its partial derivatives with respect to every constant (dict) and every
+# monthly allocation entry (months, 3), from one forward-mode pass with dual numbers. The
+# derivatives are approximate: they pass straight through the truncation to whole customers
+# (see Dual.__trunc__), which matters most for the churn constants since they only act
+# through truncated churn counts.
+def cumulative_revenue_gradient(monthly_allocations, parameters=DEFAULT_PARAMETERS):
+    dual_parameters, dual_allocations = seed_inputs(parameters, monthly_allocations)
+    cumulative_revenue = simulate_scalar(dual_allocations, dual_parameters).cumulative_revenue
+    return split_gradient(cumulative_revenue, parameters, len(monthly_allocations))
 
 # Sensitivity Analysis Function
 
-def sensitivity_analysis(base_allocations):
+def sensitivity_analysis(base_allocations, parameters=DEFAULT_PARAMETERS):
+    # Cumulative revenue of the baseline, then of each constant increased and decreased by 10%
+    perturbation_factor = 0.1
+    parameter_sets = perturbed_parameter_sets(parameters, perturbation_factor)
+    cumulative_revenues = simulate_batch(base_allocations, stack_parameters(parameter_sets)).cumulative_revenue.tolist()
+
     # Baseline cumulative revenue
-    baseline_revenue = calculate_cumulative_revenue(base_allocations)
-    
-    constants = {
-        "BASELINE_FEE": BASELINE_FEE,
-        "ORGANIC_CUSTOMERS": ORGANIC_CUSTOMERS,
-        "BASE_CHURN_RATE": BASE_CHURN_RATE,
-        "BASE_CSAT": BASE_CSAT,
-        "CSAT_IMPROVEMENT": CSAT_IMPROVEMENT,
-        "NEW_CUSTOMERS_PER_SALESPERSON": NEW_CUSTOMERS_PER_SALESPERSON,
-        "CUSTOMERS_PER_ACCOUNT_MANAGER": CUSTOMERS_PER_ACCOUNT_MANAGER,
-        "REVENUE_INCREASE_RATE": REVENUE_INCREASE_RATE,
-        "CSAT_CHURN_REDUCTION": CSAT_CHURN_REDUCTION
-    }
+    baseline_revenue = cumulative_revenues[0]
     
     impacts = {}
     
-    # Perturb each constant by 1%
-    perturbation_factor = 0.1
-    
-    for constant, original_value in constants.items():
-        # Increase the constant by 1%
-        increased_value = original_value * (1 + perturbation_factor)
-        
-        globals()[constant] = increased_value
-        increased_revenue = calculate_cumulative_revenue(base_allocations)
+    for index, (constant, original_value) in enumerate(parameters._asdict().items()):
+        # Increase the constant by 10%
+        increased_value = getattr(parameter_sets[2 * index + 1], constant)
+        increased_revenue = cumulative_revenues[2 * index + 1]
         
         increased_percentage_change = ((increased_revenue - baseline_revenue) / baseline_revenue) * 100
         print(f"Constant: {constant}, Original Value: {original_value}, Increased Value: {increased_value}")
         print(f"Original Revenue: {baseline_revenue}, Revenue Change (Increased): {increased_revenue}, Percentage Change: {increased_percentage_change}%")
         print("--------------------------------------------------\n")
         
-        # Decrease the constant by 1%
-        decreased_value = original_value * (1 - perturbation_factor)
-        globals()[constant] = decreased_value
-        decreased_revenue = calculate_cumulative_revenue(base_allocations)
+        # Decrease the constant by 10%
+        decreased_value = getattr(parameter_sets[2 * index + 2], constant)
+        decreased_revenue = cumulative_revenues[2 * index + 2]
         
         decreased_percentage_change = ((decreased_revenue - baseline_revenue) / baseline_revenue) * 100
         print(f"Constant: {constant}, Original Value: {original_value}, Decreased Value: {decreased_value}")
         print(f"Original Revenue: {baseline_revenue}, Revenue Change (Decreased): {decreased_revenue}, Percentage Change: {decreased_percentage_change}%")
         print("--------------------------------------------------\n")
         
-        # Reset the constant to its original value
-        globals()[constant] = original_value
-        
         # Calculate the average impact of increasing or decreasing the constant
         average_impact = (abs(increased_revenue - baseline_revenue) + abs(decreased_revenue - baseline_revenue)) / 2
         impacts[constant] = average_impact
@@ -121,74 +60,59 @@ def sensitivity_analysis(base_allocations):
     
     return most_impactful_constant, impacts
 
+# Rank the constants by their partial derivatives instead of finite differences: the impact of a
+# constant is the revenue change its approximate slope (see cumulative_revenue_gradient)
+# predicts for a 10% change of its value
+def derivative_sensitivity_analysis(base_allocations, parameters=DEFAULT_PARAMETERS):
+    perturbation_factor = 0.1
+    _, constant_gradients, _ = cumulative_revenue_gradient(base_allocations, parameters)
+    impacts = {constant: abs(gradient * getattr(parameters, constant) * perturbation_factor)
+               for constant, gradient in constant_gradients.items()}
+    
+    # Determine the constant with the highest impact
+    most_impactful_constant = max(impacts, key=impacts.get)
+    
+    return most_impactful_constant, impacts
+
 # Calculate the monthly revenue given allocations
-def calculate_monthly_revenue(monthly_allocations):
-    number_of_months = len(monthly_allocations)
-    initial_customer_base = 1000
-    current_csat_score = BASE_CSAT
-    monthly_revenues = []
+def calculate_monthly_revenue(monthly_allocations, parameters=DEFAULT_PARAMETERS):
+    return simulate_batch(monthly_allocations, parameters).monthly_revenue.tolist()
+
+# Global sensitivity analysis: Sobol indices of the cumulative revenue over joint samples of all
+# constants within 10% of their values, and Morris elementary effects as a cheaper screening
+def global_sensitivity_analysis(base_allocations, samples=100000, trajectories=1000, parameters=DEFAULT_PARAMETERS, seed=0):
+    rng = np.random.default_rng(seed)
+    model = lambda parameter_sets: simulate_batch(base_allocations, parameter_sets, monthly=False).cumulative_revenue
+    sobol = sobol_indices(model, parameters, parameters._fields, samples, 0.1, rng)
+    morris = morris_elementary_effects(model, parameters, parameters._fields, trajectories, 0.1, rng=rng)
     
-    current_customer_base = initial_customer_base
+    for index, constant in enumerate(sobol.constants):
+        print(f"Constant: {constant}, First Order: {sobol.first_order[index]:.4f} ± {sobol.first_order_confidence[index]:.4f}, "
+              f"Total Order: {sobol.total_order[index]:.4f} ± {sobol.total_order_confidence[index]:.4f}, "
+              f"Morris mu*: {morris.mu_star[index]:,.2f}, Morris sigma: {morris.sigma[index]:,.2f}")
+    print("--------------------------------------------------\n")
     
-    for month_index in range(number_of_months):
-        new_business_team_members, account_managers, support_agents = monthly_allocations[month_index]
-        
-        # Calculate new customers acquired
-        new_customer_count = ORGANIC_CUSTOMERS + new_business_team_members * NEW_CUSTOMERS_PER_SALESPERSON
-        
-        # Calculate churn rate and churned customers
-        churn_rate = calculate_churn_rate(current_csat_score + support_agents * CSAT_IMPROVEMENT)
-        churned_customer_count = int(current_customer_base * churn_rate)
-        
-        # Calculate the number of customers managed by account managers
-        managed_customer_count = int(min(current_customer_base - churned_customer_count, CUSTOMERS_PER_ACCOUNT_MANAGER * account_managers))
-        
-        # Calculate monthly revenue
-        revenue_from_existing_customers = (current_customer_base + new_customer_count - churned_customer_count - managed_customer_count) * BASELINE_FEE
-        revenue_from_managed_customers = calculate_account_manager_revenue(managed_customer_count, month_index + 1)
-        
-        monthly_revenue = revenue_from_existing_customers + revenue_from_managed_customers
-        
-        # Update monthly revenues list
-        monthly_revenues.append(monthly_revenue)
-        
-        # Update customer base and CSAT for the next month
-        current_customer_base = current_customer_base - churned_customer_count + new_customer_count
+    # Indices at growing sample sizes; they should settle as the samples grow
+    for size, first_order, total_order in zip(sobol.sample_sizes, sobol.first_order_history, sobol.total_order_history):
+        print(f"Samples: {size}, First Order: {first_order.round(4).tolist()}, Total Order: {total_order.round(4).tolist()}")
     
-    return monthly_revenues
+    return sobol, morris
 
 # Plot monthly revenues
-def plot_monthly_revenues(base_allocations):
-    constants = {
-        "BASELINE_FEE": BASELINE_FEE,
-        "ORGANIC_CUSTOMERS": ORGANIC_CUSTOMERS,
-        "BASE_CHURN_RATE": BASE_CHURN_RATE,
-        "BASE_CSAT": BASE_CSAT,
-        "CSAT_IMPROVEMENT": CSAT_IMPROVEMENT,
-        "NEW_CUSTOMERS_PER_SALESPERSON": NEW_CUSTOMERS_PER_SALESPERSON,
-        "CUSTOMERS_PER_ACCOUNT_MANAGER": CUSTOMERS_PER_ACCOUNT_MANAGER,
-        "REVENUE_INCREASE_RATE": REVENUE_INCREASE_RATE,
-        "CSAT_CHURN_REDUCTION": CSAT_CHURN_REDUCTION
-    }
-    
+def plot_monthly_revenues(base_allocations, parameters=DEFAULT_PARAMETERS):
+    import plotly.graph_objs as go
+    import plotly.offline as pyo
+
     perturbation_factor = 0.1
+    parameter_sets = perturbed_parameter_sets(parameters, perturbation_factor)
+    monthly_revenues = simulate_batch(base_allocations, stack_parameters(parameter_sets)).monthly_revenue.tolist()
+
+    # Baseline monthly revenues
+    baseline_monthly_revenues = monthly_revenues[0]
     
-    for constant, original_value in constants.items():
-        # Calculate baseline monthly revenues
-        baseline_monthly_revenues = calculate_monthly_revenue(base_allocations)
-        
-        # Increase the constant by 1%
-        increased_value = original_value * (1 + perturbation_factor)
-        globals()[constant] = increased_value
-        increased_monthly_revenues = calculate_monthly_revenue(base_allocations)
-        
-        # Decrease the constant by 1%
-        decreased_value = original_value * (1 - perturbation_factor)
-        globals()[constant] = decreased_value
-        decreased_monthly_revenues = calculate_monthly_revenue(base_allocations)
-        
-        # Reset the constant to its original value
-        globals()[constant] = original_value
+    for index, constant in enumerate(parameters._fields):
+        increased_monthly_revenues = monthly_revenues[2 * index + 1]
+        decreased_monthly_revenues = monthly_revenues[2 * index + 2]
         
         # Create traces for the plot
         trace_baseline = go.Scatter(
@@ -223,13 +147,24 @@ def plot_monthly_revenues(base_allocations):
         # fig.savefig(f'revenue/{constant}_monthly_revenue.png')
         pyo.plot(fig, filename=f'{constant}_monthly_revenue.html')
 
-# Example monthly allocations for 12 months
-monthly_allocations = [[14, 0, 6], [12, 0, 8], [13, 0, 7], [12, 0, 8], [11, 0, 9], [11, 0, 9], [11, 0, 9], [11, 0, 9], [12, 0, 8], [10, 0, 10], [10, 0, 10], [10, 0, 10], [8, 2, 10], [0, 10, 10], [0, 11, 9], [0, 12, 8], [0, 12, 8], [0, 13, 7], [0, 14, 6], [0, 15, 5], [0, 17, 3], [0, 19, 1], [0, 20, 0], [0, 20, 0]]
+if __name__ == "__main__":
+    # Example monthly allocations for 12 months
+    monthly_allocations = [[14, 0, 6], [12, 0, 8], [13, 0, 7], [12, 0, 8], [11, 0, 9], [11, 0, 9], [11, 0, 9], [11, 0, 9], [12, 0, 8], [10, 0, 10], [10, 0, 10], [10, 0, 10], [8, 2, 10], [0, 10, 10], [0, 11, 9], [0, 12, 8], [0, 12, 8], [0, 13, 7], [0, 14, 6], [0, 15, 5], [0, 17, 3], [0, 19, 1], [0, 20, 0], [0, 20, 0]]
+
+
+    # Perform sensitivity analysis and plot graphs
+    most_impactful_constant, impacts = sensitivity_analysis(monthly_allocations)
+    plot_monthly_revenues(monthly_allocations)
 
+    print("Most impactful constant:", most_impactful_constant)
+    print("Impacts of each constant:", impacts)
 
-# Perform sensitivity analysis and plot graphs
-most_impactful_constant, impacts = sensitivity_analysis(monthly_allocations)
-plot_monthly_revenues(monthly_allocations)
+    # The same ranking from one pass with approximate slopes
+    most_impactful_constant, impacts = derivative_sensitivity_analysis(monthly_allocations)
+    print("Most impactful constant (derivatives):", most_impactful_constant)
+    print("Impacts of each constant (derivatives):", impacts)
 
-print("Most impactful constant:", most_impactful_constant)
-print("Impacts of each constant:", impacts)
+    # Also rank the constants by Sobol indices over joint perturbations, which capture their interactions
+    GLOBAL_SENSITIVITY = False
+    if GLOBAL_SENSITIVITY:
+        global_sensitivity_analysis(monthly_allocations)
@@ -1,12 +1,22 @@
-from revenue import calculate_cumulative_revenue
+from revenue import (INITIAL_STATE, calculate_cumulative_revenue, evaluate_allocations, replicate_cumulative_revenues,
+                     resume_allocations, simulate)
 
 NUM_MONTHS = 24
 TOTAL_EMPLOYEES = 20
 
 
+import hashlib
+import multiprocessing
+import os
 import random
+from collections import OrderedDict
+
+import numpy as np
 from deap import base, creator, tools, algorithms
 
+import revenue
+from evaluation_cache import evaluation_key, model_version
+
 
 
 # Create the genetic algorithm components
@@ -33,26 +43,515 @@ toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
 # Define the evaluation function
 def evaluate(individual):
-    return (calculate_cumulative_revenue(individual,NUM_MONTHS)[0],)
+    return (calculate_cumulative_revenue(individual,len(individual))[0],)
+
+# Memory budget for cached fitnesses and the approximate size of one cache entry
+# (16 byte digest key, fitness tuple and OrderedDict bookkeeping)
+FITNESS_CACHE_BYTES = 256 * 1024 * 1024
+FITNESS_CACHE_ENTRY_BYTES = 200
+
+# Fitness values keyed by a compact hash of the allocation, evicting the least
+# recently used entries once the memory budget is reached
+class FitnessCache:
+    def __init__(self, max_bytes=FITNESS_CACHE_BYTES, verbose=True):
+        self.max_entries = max(1, max_bytes // FITNESS_CACHE_ENTRY_BYTES)
+        self.verbose = verbose
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.history = []
+
+    # 16 byte digest of every allocation in a (population, months, 3) array, evaluated in a
+    # fitness mode (see fitness_mode)
+    @staticmethod
+    def keys(allocations, mode=b""):
+        rows = np.ascontiguousarray(allocations, dtype=np.int32).reshape(len(allocations), -1)
+        return [hashlib.blake2b(mode + row.tobytes(), digest_size=16).digest() for row in rows]
+
+    def get(self, key):
+        fitness = self.entries.get(key)
+        if fitness is not None:
+            self.entries.move_to_end(key)
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def record(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+
+    # Close the current generation's hit/miss counts and report them
+    def end_generation(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        self.history.append((self.hits, self.misses))
+        if self.verbose:
+            print(f"Fitness cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1%} hit rate), {len(self.entries)} entries")
+        self.hits = 0
+        self.misses = 0
+
+fitness_cache = FitnessCache()
+
+# Worker processes for fitness evaluation and the number of individuals sent to a worker at a time
+EVALUATION_WORKERS = os.cpu_count()
+EVALUATION_CHUNK_SIZE = 2000
+
+# Process pool shared by every generation; None evaluates in this process
+evaluation_pool = None
+evaluation_chunk_size = EVALUATION_CHUNK_SIZE
+
+# Start the evaluation workers once so all generations reuse them
+def start_evaluation_pool(workers=EVALUATION_WORKERS, chunk_size=EVALUATION_CHUNK_SIZE):
+    global evaluation_pool, evaluation_chunk_size
+    evaluation_pool = multiprocessing.Pool(workers)
+    evaluation_chunk_size = chunk_size
+
+def stop_evaluation_pool():
+    global evaluation_pool
+    if evaluation_pool is not None:
+        evaluation_pool.close()
+        evaluation_pool.join()
+        evaluation_pool = None
+
+# Months between stored simulation checkpoints of an evaluated individual
+CHECKPOINT_EVERY = 6
+
+# Simulate individuals, resuming each one from the last checkpoint of the plan it was
+# cloned from that lies before its first changed month. Every evaluated individual keeps
+# its plan and checkpoints, and DEAP's clone hands them on to its offspring.
+def evaluate_incrementally(individuals):
+    allocations = np.array(individuals, dtype=np.int64)
+    months = allocations.shape[1]
+
+    start_months = np.zeros(len(individuals), dtype=np.int64)
+    for index, individual in enumerate(individuals):
+        evaluated_plan = getattr(individual, "evaluated_plan", None)
+        if evaluated_plan is not None and evaluated_plan.shape == allocations[index].shape:
+            changed_months = np.flatnonzero((allocations[index] != evaluated_plan).any(axis=1))
+            first_change = changed_months[0] if len(changed_months) else months - 1
+            start_months[index] = (first_change // CHECKPOINT_EVERY) * CHECKPOINT_EVERY
+
+    # Split every resume-month group into chunks and simulate them, in parallel if a pool is running
+    tasks = []
+    task_indices = []
+    for start_month in np.unique(start_months).tolist():
+        group = np.flatnonzero(start_months == start_month)
+        checkpoint = start_month // CHECKPOINT_EVERY
+        for chunk in np.array_split(group, -(-len(group) // evaluation_chunk_size)):
+            if start_month:
+                histograms = np.array([individuals[index].checkpoint_histograms[checkpoint] for index in chunk])
+                revenues = np.array([individuals[index].checkpoint_revenues[checkpoint] for index in chunk])
+            else:
+                histograms = np.tile(INITIAL_STATE.managed_histogram, (len(chunk), 1))
+                revenues = np.full(len(chunk), INITIAL_STATE.cumulative_revenue, dtype=np.float64)
+            tasks.append((allocations[chunk], start_month, histograms, revenues, CHECKPOINT_EVERY))
+            task_indices.append(chunk)
+
+    if evaluation_pool is None:
+        results = [resume_allocations(*task) for task in tasks]
+    else:
+        results = evaluation_pool.starmap(resume_allocations, tasks, chunksize=1)
+
+    cumulative_revenues = np.empty(len(individuals), dtype=np.float64)
+    for task, chunk, (chunk_revenues, checkpoint_histograms, checkpoint_revenues) in zip(tasks, task_indices, results):
+        start_month = task[1]
+        checkpoint = start_month // CHECKPOINT_EVERY
+        cumulative_revenues[chunk] = chunk_revenues
+
+        for position, index in enumerate(chunk.tolist()):
+            individual = individuals[index]
+            if start_month:
+                individual.checkpoint_histograms = np.concatenate(
+                    [individual.checkpoint_histograms[:checkpoint], checkpoint_histograms[position]])
+                individual.checkpoint_revenues = np.concatenate(
+                    [individual.checkpoint_revenues[:checkpoint], checkpoint_revenues[position]])
+            else:
+                individual.checkpoint_histograms = checkpoint_histograms[position]
+                individual.checkpoint_revenues = checkpoint_revenues[position]
+            individual.evaluated_plan = allocations[index].astype(np.int16)
+
+    return cumulative_revenues.tolist()
+
+# Fitness from the stochastic simulator instead of the deterministic one: None keeps the
+# deterministic revenue, "mean" uses the expected revenue over STOCHASTIC_REPLICATES replicates
+# and a number such as 5 uses that percentile of the replicates' revenue
+STOCHASTIC_FITNESS = None
+STOCHASTIC_REPLICATES = 100
+STOCHASTIC_SEED = 0
+
+# The settings fitnesses are computed with, as bytes for the fitness cache keys, so fitnesses
+# cached in one mode are never reused after STOCHASTIC_FITNESS, STOCHASTIC_REPLICATES or
+# STOCHASTIC_SEED change (the replicates and seed only matter to the stochastic modes)
+def fitness_mode():
+    if STOCHASTIC_FITNESS is None:
+        return b""
+    return repr((STOCHASTIC_FITNESS, STOCHASTIC_REPLICATES, STOCHASTIC_SEED)).encode()
+
+# Fitness of individuals under the stochastic simulator, in chunks with their own seeded streams
+def evaluate_stochastically(individuals):
+    allocations = np.array(individuals, dtype=np.int64)
+    chunks = np.array_split(np.arange(len(individuals)), -(-len(individuals) // evaluation_chunk_size))
+    seeds = np.random.SeedSequence(STOCHASTIC_SEED).spawn(len(chunks))
+    tasks = [(allocations[chunk], STOCHASTIC_REPLICATES, seed) for chunk, seed in zip(chunks, seeds)]
+
+    if evaluation_pool is None:
+        results = [replicate_cumulative_revenues(*task) for task in tasks]
+    else:
+        results = evaluation_pool.starmap(replicate_cumulative_revenues, tasks, chunksize=1)
+
+    revenues = np.concatenate(results)
+    if STOCHASTIC_FITNESS == "mean":
+        return revenues.mean(axis=1).tolist()
+    return np.percentile(revenues, STOCHASTIC_FITNESS, axis=1).tolist()
+
+# Deterministic evaluations persisted across runs and processes (an EvaluationCache from
+# evaluation_cache.py); None keeps fitnesses in the in-memory cache only
+persistent_cache = None
+REVENUE_MODEL = model_version(revenue.__file__)
+
+# Look up the metrics of individuals in the persistent cache, computing the missing ones with
+# simulate(individuals) -> {metric: [value per individual]}
+def persisted_evaluations(individuals, metrics, simulate):
+    keys = [evaluation_key(REVENUE_MODEL, None, individual) for individual in individuals]
+    values = persistent_cache.evaluate(keys, metrics, lambda indices: simulate([individuals[index] for index in indices]))
+    return [tuple(float(values[metric][index][0]) for metric in metrics) for index in range(len(individuals))]
+
+# Fitness tuples of individuals from the deterministic or the stochastic revenue simulator
+def simulate_revenue_fitnesses(individuals):
+    if STOCHASTIC_FITNESS is None and persistent_cache is not None:
+        return persisted_evaluations(individuals, ["cumulative_revenue"],
+                                     lambda missing: {"cumulative_revenue": evaluate_incrementally(missing)})
+    if STOCHASTIC_FITNESS is None:
+        cumulative_revenues = evaluate_incrementally(individuals)
+    else:
+        cumulative_revenues = evaluate_stochastically(individuals)
+    return [(revenue,) for revenue in cumulative_revenues]
+
+# Evaluate a whole generation with one batched simulation, simulating only
+# allocations that are neither cached nor duplicated within the generation (cache defaults to
+# the current fitness_cache)
+def evaluate_population(individuals, cache=None, simulate_fitnesses=simulate_revenue_fitnesses):
+    if not individuals:
+        return []
+    cache = fitness_cache if cache is None else cache
+    allocations = np.array(individuals, dtype=np.int64)
+    keys = cache.keys(allocations, fitness_mode())
+
+    fitnesses = {}
+    missing = {}
+    for index, key in enumerate(keys):
+        if key in fitnesses or key in missing:
+            continue
+        fitness = cache.get(key)
+        if fitness is None:
+            missing[key] = index
+        else:
+            fitnesses[key] = fitness
+
+    if missing:
+        for key, fitness in zip(missing, simulate_fitnesses([individuals[index] for index in missing.values()])):
+            fitnesses[key] = fitness
+            cache.put(key, fitness)
+
+    cache.record(len(keys) - len(missing), len(missing))
+    return [fitnesses[key] for key in keys]
+
+# Route fitness evaluations through evaluate_population, map anything else as usual
+def map_population(func, individuals):
+    if func is toolbox.evaluate:
+        fitnesses = evaluate_population(list(individuals))
+        fitness_cache.end_generation()
+        return fitnesses
+    if evaluation_pool is not None:
+        return evaluation_pool.map(func, individuals, chunksize=evaluation_chunk_size)
+    return list(map(func, individuals))
+
+# Move one or more employees from one role to another in some months; every month
+# keeps its total of TOTAL_EMPLOYEES
+def mut_transfer_employees(individual, indpb, max_transfer=2):
+    for month in individual:
+        if random.random() < indpb:
+            source, target = random.sample(range(3), 2)
+            moved = min(random.randint(1, max_transfer), month[source])
+            month[source] -= moved
+            month[target] += moved
+    return individual,
+
+# Move a change of allocation (such as the switch from sales to account managers)
+# a few months earlier or later by extending the allocation on one side of it
+def mut_shift_transition(individual, max_shift=3):
+    transitions = [month for month in range(1, len(individual)) if individual[month] != individual[month - 1]]
+    if not transitions:
+        return individual,
+    transition = random.choice(transitions)
+    shift = random.randint(1, max_shift)
+    if random.random() < 0.5:
+        for month in range(max(0, transition - shift), transition):
+            individual[month] = list(individual[transition])
+    else:
+        for month in range(transition, min(len(individual), transition + shift)):
+            individual[month] = list(individual[transition - 1])
+    return individual,
+
+# Relative frequency of each mutation operator
+MUTATION_WEIGHTS = {"shuffle": 0.2, "transfer": 0.5, "shift": 0.3}
+
+# Apply one mutation operator, picked by MUTATION_WEIGHTS
+def mutate_allocation(individual):
+    operator = random.choices(list(MUTATION_WEIGHTS), weights=list(MUTATION_WEIGHTS.values()))[0]
+    if operator == "shuffle":
+        return tools.mutShuffleIndexes(individual, indpb=0.05)
+    if operator == "transfer":
+        return mut_transfer_employees(individual, indpb=0.1)
+    return mut_shift_transition(individual)
 
 toolbox.register("evaluate", evaluate)
+toolbox.register("map", map_population)
 toolbox.register("mate", tools.cxTwoPoint)
-toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.05)
+toolbox.register("mutate", mutate_allocation)
 toolbox.register("select", tools.selTournament, tournsize=3)
 
-# Set up the genetic algorithm
-population = toolbox.population(n=100000)
-ngen = 50
-cxpb = 0.7
-mutpb = 0.2
+# Multi-objective mode (NSGA-II): maximise cumulative revenue and average CLV together and
+# keep every non-dominated plan found in a Pareto archive
+creator.create("FitnessRevenueCLV", base.Fitness, weights=(1.0, 1.0))
+creator.create("RevenueCLVIndividual", list, fitness=creator.FitnessRevenueCLV)
+
+objective_cache = FitnessCache()
+
+def evaluate_objectives(individual):
+    result = simulate(individual, len(individual))
+    return result.cumulative_revenue, result.avg_clv
+
+# Revenue and average CLV of individuals, through the persistent cache if there is one
+def simulate_objectives(individuals):
+    if persistent_cache is not None:
+        return persisted_evaluations(individuals, ["cumulative_revenue", "avg_clv"], simulate_objective_values)
+    return list(zip(*simulate_objective_values(individuals).values()))
+
+# Revenue and average CLV of individuals by metric, from one fused batched simulation per chunk
+def simulate_objective_values(individuals):
+    allocations = np.array(individuals, dtype=np.int64)
+    chunks = np.array_split(allocations, -(-len(allocations) // evaluation_chunk_size))
+    if evaluation_pool is None:
+        results = [evaluate_allocations(chunk) for chunk in chunks]
+    else:
+        results = evaluation_pool.map(evaluate_allocations, chunks, chunksize=1)
+    return {"cumulative_revenue": [revenue for cumulative_revenues, _, _ in results for revenue in cumulative_revenues.tolist()],
+            "avg_clv": [avg_clv for _, _, avg_clvs in results for avg_clv in avg_clvs.tolist()]}
+
+# Route objective evaluations through evaluate_population with the objective cache
+def map_objectives(func, individuals):
+    if func is objective_toolbox.evaluate:
+        fitnesses = evaluate_population(list(individuals), objective_cache, simulate_objectives)
+        objective_cache.end_generation()
+        return fitnesses
+    return map_population(func, individuals)
+
+objective_toolbox = base.Toolbox()
+objective_toolbox.register("individual", tools.initRepeat, creator.RevenueCLVIndividual, toolbox.month_allocation, n=NUM_MONTHS)
+objective_toolbox.register("population", tools.initRepeat, list, objective_toolbox.individual)
+objective_toolbox.register("evaluate", evaluate_objectives)
+objective_toolbox.register("map", map_objectives)
+objective_toolbox.register("mate", tools.cxTwoPoint)
+objective_toolbox.register("mutate", mutate_allocation)
+objective_toolbox.register("select", tools.selNSGA2, nd="log")
+
+# Run NSGA-II (mu + lambda with non-dominated sorting and crowding) and return the Pareto archive,
+# updated with every generation's offspring, sorted by revenue
+def run_nsga2(population_size=10000, ngen=50, cxpb=0.7, mutpb=0.2):
+    population = objective_toolbox.population(n=population_size)
+    pareto_front = tools.ParetoFront()
+    algorithms.eaMuPlusLambda(population, objective_toolbox, mu=population_size, lambda_=population_size,
+                              cxpb=cxpb, mutpb=mutpb, ngen=ngen, halloffame=pareto_front, verbose=True)
+    return pareto_front
+
+# Island model: independent populations on their own processes that pass their best
+# individuals around a ring every MIGRATION_INTERVAL generations
+ISLANDS = os.cpu_count()
+ISLAND_POPULATION = 10000
+MIGRATION_INTERVAL = 5
+MIGRANTS = 20
+
+# Share of the initial population made of seed plans and mutated copies of them
+SEED_FRACTION = 0.2
+
+# Stretch or cut a plan to the given number of months, either by tiling the whole plan (as the
+# stored long-horizon optima do) or by extending it with its last month
+def fit_plan(plan, months, mode="tile"):
+    if mode == "tile":
+        return [list(plan[month % len(plan)]) for month in range(months)]
+    return [list(plan[min(month, len(plan) - 1)]) for month in range(months)]
+
+# Initial population for a horizon: every seed plan tiled and extended to the horizon, mutated
+# copies of those up to seed_fraction of the population, and random individuals for the rest
+def seeded_population(population_size, months=NUM_MONTHS, seed_plans=(), seed_fraction=SEED_FRACTION):
+    seeds = [creator.Individual(fit_plan(plan, months, mode)) for plan in seed_plans for mode in ("tile", "extend")]
+    population = seeds[:population_size]
+    while seeds and len(population) < int(population_size * seed_fraction):
+        population.append(toolbox.mutate(toolbox.clone(random.choice(seeds)))[0])
+    while len(population) < population_size:
+        population.append(tools.initRepeat(creator.Individual, toolbox.month_allocation, n=months))
+    return population
+
+# Run the genetic algorithm on one population and return it. With patience, run the eaSimple
+# loop by hand and stop once the best fitness has not improved for patience generations
+def run_ga(population_size=100000, ngen=50, cxpb=0.7, mutpb=0.2, months=NUM_MONTHS, seed_plans=(), patience=None):
+    population = seeded_population(population_size, months, seed_plans)
+    if patience is None:
+        algorithms.eaSimple(population, toolbox, cxpb=cxpb, mutpb=mutpb, ngen=ngen, verbose=True)
+        return population
+
+    for individual, fitness in zip(population, toolbox.map(toolbox.evaluate, population)):
+        individual.fitness.values = fitness
+    best = tools.selBest(population, 1)[0].fitness.values[0]
+    stalled = 0
+
+    for gen in range(1, ngen + 1):
+        offspring = toolbox.select(population, len(population))
+        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+        for individual, fitness in zip(invalid_ind, toolbox.map(toolbox.evaluate, invalid_ind)):
+            individual.fitness.values = fitness
+        population[:] = offspring
+
+        generation_best = tools.selBest(population, 1)[0].fitness.values[0]
+        print(f"gen {gen} | nevals {len(invalid_ind)} | best {generation_best:,.2f}")
+        stalled = stalled + 1 if generation_best <= best else 0
+        best = max(best, generation_best)
+        if stalled >= patience:
+            print(f"Stopping after {gen} generations: no improvement in {patience}")
+            break
+
+    return population
+
+# Horizons optimised in sequence by run_horizons
+HORIZONS = (12, 24, 36, 48, 60, 120)
+
+# A seeded horizon starts from the previous horizon's best plan, so it gets this fraction of
+# ngen and stops once the best fitness has not improved for SEEDED_PATIENCE generations
+SEEDED_GENERATION_FRACTION = 0.3
+SEEDED_PATIENCE = 3
+
+# Generations to run for a horizon: ngen is either a dict of generations per horizon, or the
+# full budget for an unseeded horizon, cut to SEEDED_GENERATION_FRACTION of it for seeded ones
+def horizon_generations(ngen, months, seeded=False):
+    if isinstance(ngen, dict):
+        return ngen[months]
+    return max(1, round(ngen * SEEDED_GENERATION_FRACTION)) if seeded else ngen
+
+# Optimise each horizon in turn, seeding every run after the first with the best plan of the
+# previous horizon (see horizon_generations for the budgets); returns the best plan of every horizon
+def run_horizons(horizons=HORIZONS, population_size=100000, ngen=50, cxpb=0.7, mutpb=0.2, seed_plans=()):
+    best_plans = {}
+    for months in horizons:
+        previous_best = [best_plans[max(best_plans)]] if best_plans else []
+        seeded = bool(previous_best)
+        population = run_ga(population_size, horizon_generations(ngen, months, seeded), cxpb, mutpb, months,
+                            list(seed_plans) + previous_best, SEEDED_PATIENCE if seeded else None)
+        best_plans[months] = list(tools.selBest(population, k=1)[0])
+        print(f"{months} months | best {evaluate(best_plans[months])[0]:,.2f}")
+    return best_plans
+
+# One island: the eaSimple loop, sending its best individuals to the next island and
+# replacing its worst with the previous island's every MIGRATION_INTERVAL generations
+def run_island(island, population_size, ngen, cxpb, mutpb, inbox, outbox, results, seed):
+    random.seed(seed + island)
+    fitness_cache.verbose = False
+
+    population = toolbox.population(n=population_size)
+    for individual, fitness in zip(population, toolbox.map(toolbox.evaluate, population)):
+        individual.fitness.values = fitness
+
+    for gen in range(1, ngen + 1):
+        offspring = toolbox.select(population, len(population))
+        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+        for individual, fitness in zip(invalid_ind, toolbox.map(toolbox.evaluate, invalid_ind)):
+            individual.fitness.values = fitness
+        population[:] = offspring
+
+        if gen % MIGRATION_INTERVAL == 0 and gen < ngen:
+            outbox.put([toolbox.clone(ind) for ind in tools.selBest(population, MIGRANTS)])
+            immigrants = inbox.get()
+            worst = sorted(range(len(population)), key=lambda index: population[index].fitness)[:len(immigrants)]
+            for index, immigrant in zip(worst, immigrants):
+                population[index] = immigrant
+            print(f"Island {island} | gen {gen} | best {tools.selBest(population, 1)[0].fitness.values[0]:,.2f}")
+
+    results.put(toolbox.clone(tools.selBest(population, 1)[0]))
+
+# Run ISLANDS populations in parallel processes and return the best individual of each
+def run_islands(islands=ISLANDS, population_size=ISLAND_POPULATION, ngen=50, cxpb=0.7, mutpb=0.2, seed=0):
+    queues = [multiprocessing.Queue() for _ in range(islands)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_island,
+                                         args=(island, population_size, ngen, cxpb, mutpb,
+                                               queues[island], queues[(island + 1) % islands], results, seed))
+                 for island in range(islands)]
+    for process in processes:
+        process.start()
+    best_individuals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return best_individuals
+
+if __name__ == "__main__":
+    # Split the search into islands instead of one large population
+    ISLAND_MODEL = False
+    # Search the revenue / CLV trade-off instead of revenue alone
+    MULTI_OBJECTIVE = False
+    # Optimise every horizon in HORIZONS, each seeded with the best plan of the one before
+    HORIZON_CONTINUATION = False
+    # Plan a large organisation (relaxation.py) instead of searching headcount combinations
+    LARGE_SCALE = False
+    # Reuse fitnesses evaluated by earlier runs and store new ones (evaluation_cache.py)
+    PERSISTENT_CACHE = False
+
+    if PERSISTENT_CACHE:
+        from evaluation_cache import EvaluationCache
+        persistent_cache = EvaluationCache()
+
+    if MULTI_OBJECTIVE:
+        start_evaluation_pool()
+        pareto_front = run_nsga2()
+        stop_evaluation_pool()
+
+        print("Revenue | Lifetime Value | Allocation")
+        for individual in pareto_front:
+            revenue, avg_clv = individual.fitness.values
+            print(f"${revenue:,.2f} | ${avg_clv:,.2f} | {individual}")
+    elif HORIZON_CONTINUATION:
+        start_evaluation_pool()
+        best_plans = run_horizons()
+        stop_evaluation_pool()
+
+        for months, best_plan in best_plans.items():
+            print(f"{months} months | ${evaluate(best_plan)[0]:,.2f} | {best_plan}")
+    elif LARGE_SCALE:
+        from relaxation import LARGE_SCALE_CUSTOMERS, LARGE_SCALE_EMPLOYEES, optimize_relaxed
 
-# Run the genetic algorithm
-algorithms.eaSimple(population, toolbox, cxpb=cxpb, mutpb=mutpb, ngen=ngen, verbose=True)
+        best_plan, best_revenue = optimize_relaxed(NUM_MONTHS, LARGE_SCALE_EMPLOYEES, LARGE_SCALE_CUSTOMERS)
+        print(f"Best allocation: {best_plan.tolist()}")
+        print(f"\nTotal cumulative revenue over {NUM_MONTHS} months: ${best_revenue:,.2f}")
+    else:
+        if ISLAND_MODEL:
+            population = run_islands()
+        else:
+            # Evaluate fitness on every core with workers started once for the whole run
+            start_evaluation_pool()
+            population = run_ga(population_size=100000, ngen=50, cxpb=0.7, mutpb=0.2)
+            stop_evaluation_pool()
 
-# Get the best individual
-best_ind = tools.selBest(population, k=1)[0]
-best_revenue = evaluate(best_ind)[0]
+        # Get the best individual
+        best_ind = tools.selBest(population, k=1)[0]
+        best_revenue = evaluate(best_ind)[0]
 
-print(f"Best allocation: {best_ind}")
-print(f"Best cumulative revenue: {best_revenue}")
-print(f"\nTotal cumulative revenue over {NUM_MONTHS} months: ${best_revenue:,.2f}")
+        print(f"Best allocation: {best_ind}")
+        print(f"Best cumulative revenue: {best_revenue}")
+        print(f"\nTotal cumulative revenue over {NUM_MONTHS} months: ${best_revenue:,.2f}")
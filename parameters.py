@@ -0,0 +1,21 @@
+import numpy as np
+
+# The models take their constants as a parameter set: a namedtuple with one field per
+# constant. A parameter set whose fields are arrays describes several parameter sets at
+# once and lets a model simulate all of them in one vectorized pass.
+
+# Stack a list of parameter sets into one parameter set with a (sets,) float array per constant
+def stack_parameters(parameter_sets):
+    values = np.array(parameter_sets, dtype=np.float64).reshape(len(parameter_sets), -1)
+    return type(parameter_sets[0])(*values.T)
+
+# The parameter set followed by, for each constant (all of them by default), a copy with
+# the constant increased and a copy with it decreased by perturbation_factor. A model given
+# stack_parameters of the list simulates the baseline and every perturbation in one pass.
+def perturbed_parameter_sets(parameters, perturbation_factor=0.1, constants=None):
+    parameter_sets = [parameters]
+    for constant in constants or parameters._fields:
+        original_value = getattr(parameters, constant)
+        parameter_sets.append(parameters._replace(**{constant: original_value * (1 + perturbation_factor)}))
+        parameter_sets.append(parameters._replace(**{constant: original_value * (1 - perturbation_factor)}))
+    return parameter_sets
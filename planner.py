@@ -0,0 +1,103 @@
+import time
+
+import numpy as np
+
+from revenue import INITIAL_STATE, MANAGED_MONTH_REVENUE_ARRAY, advance_managed_histograms, calculate_cumulative_revenue
+
+NUM_MONTHS = 24
+TOTAL_EMPLOYEES = 20
+
+# Number of simulator states kept after every month, and how many of the best states by each
+# cheap heuristic (per kept state) are scored with rollouts before the beam is cut
+BEAM_WIDTH = 20
+ROLLOUT_CANDIDATES = 3
+
+# Rollouts grow the customer base with sales and support, then switch to account managers and
+# support (the shape of the stored GA optima); the switch is tried at these fractions of the remaining months
+GROW_ALLOCATION = (11, 0, 9)
+HARVEST_ALLOCATION = (0, 11, 9)
+ROLLOUT_SWITCH_FRACTIONS = (0, 0.25, 0.5, 0.75, 1)
+
+# Assumed monthly churn when valuing a state's customers over the remaining months
+HEURISTIC_CHURN_RATE = 0.02
+
+# Every (new_business, account_managers, support) split of the employees, shape (splits, 3)
+def month_allocations(total_employees=TOTAL_EMPLOYEES):
+    return np.array([(new_business, account_managers, total_employees - new_business - account_managers)
+                     for new_business in range(total_employees + 1)
+                     for account_managers in range(total_employees + 1 - new_business)], dtype=np.int64)
+
+# Best cumulative revenue reachable from each state by growing for a while and then harvesting
+def rollout_revenue(managed_histograms, cumulative_revenues, months, grow_allocation, harvest_allocation):
+    best_revenues = cumulative_revenues.copy()
+    for fraction in ROLLOUT_SWITCH_FRACTIONS:
+        switch_month = int(round(months * fraction))
+        histograms = managed_histograms
+        revenues = cumulative_revenues.copy()
+        for month in range(months):
+            allocation = grow_allocation if month < switch_month else harvest_allocation
+            histograms, _, _ = advance_managed_histograms(histograms, np.tile(allocation, (len(histograms), 1)))
+            revenues += histograms @ MANAGED_MONTH_REVENUE_ARRAY
+        best_revenues = np.maximum(best_revenues, revenues)
+    return best_revenues
+
+# Search month by month over simulator states for the allocation with the highest cumulative revenue.
+# States reached with the same managed-month histogram only keep the one with the most revenue so far,
+# since every later month depends on the histogram alone. Returns the allocation, its cumulative revenue
+# and the number of simulated state-months.
+def plan_allocation(months=NUM_MONTHS, beam_width=BEAM_WIDTH, total_employees=TOTAL_EMPLOYEES,
+                    grow_allocation=GROW_ALLOCATION, harvest_allocation=HARVEST_ALLOCATION):
+    splits = month_allocations(total_employees)
+    histograms = np.array([INITIAL_STATE.managed_histogram], dtype=np.int64)
+    cumulative_revenues = np.array([INITIAL_STATE.cumulative_revenue], dtype=np.float64)
+    plans = np.zeros((1, 0), dtype=np.int64)
+    evaluations = 0
+
+    for month in range(months):
+        # Expand every kept state by every split
+        beam = len(histograms)
+        next_histograms, _, _ = advance_managed_histograms(np.repeat(histograms, len(splits), axis=0),
+                                                           np.tile(splits, (beam, 1)))
+        monthly_revenues = next_histograms @ MANAGED_MONTH_REVENUE_ARRAY
+        next_revenues = np.repeat(cumulative_revenues, len(splits)) + monthly_revenues
+        next_plans = np.concatenate([np.repeat(plans, len(splits), axis=0),
+                                     np.tile(np.arange(len(splits)), beam)[:, None]], axis=1)
+        evaluations += len(next_histograms)
+
+        # Deduplicate states, keeping the highest revenue for each histogram
+        order = np.lexsort((-next_revenues,) + tuple(next_histograms.T))
+        next_histograms = next_histograms[order]
+        unique = np.ones(len(order), dtype=bool)
+        unique[1:] = (next_histograms[1:] != next_histograms[:-1]).any(axis=1)
+        next_histograms = next_histograms[unique]
+        next_revenues = next_revenues[order][unique]
+        monthly_revenues = monthly_revenues[order][unique]
+        next_plans = next_plans[order][unique]
+
+        # Shortlist states by valuing their customers and by their current monthly revenue,
+        # then keep the ones with the best rollouts
+        remaining_months = months - month - 1
+        customer_lifetime = (1 - (1 - HEURISTIC_CHURN_RATE) ** remaining_months) / HEURISTIC_CHURN_RATE
+        customer_value = next_revenues + next_histograms.sum(axis=1) * MANAGED_MONTH_REVENUE_ARRAY[0] * customer_lifetime
+        run_rate_value = next_revenues + monthly_revenues * remaining_months
+        shortlist = beam_width * ROLLOUT_CANDIDATES
+        candidates = np.union1d(np.argsort(-customer_value)[:shortlist], np.argsort(-run_rate_value)[:shortlist])
+        scores = rollout_revenue(next_histograms[candidates], next_revenues[candidates], remaining_months,
+                                 grow_allocation, harvest_allocation)
+        evaluations += len(candidates) * len(ROLLOUT_SWITCH_FRACTIONS) * remaining_months
+        keep = candidates[np.argsort(-scores, kind="stable")[:beam_width]]
+
+        histograms = next_histograms[keep]
+        cumulative_revenues = next_revenues[keep]
+        plans = next_plans[keep]
+
+    best = int(np.argmax(cumulative_revenues))
+    return splits[plans[best]].tolist(), float(cumulative_revenues[best]), evaluations
+
+if __name__ == "__main__":
+    start = time.time()
+    best_allocation, best_revenue, evaluations = plan_allocation(NUM_MONTHS)
+
+    print(f"Best allocation: {best_allocation}")
+    print(f"Best cumulative revenue: {calculate_cumulative_revenue(best_allocation, NUM_MONTHS)[0]}")
+    print(f"Simulated state-months: {evaluations:,} in {time.time() - start:.2f}s")
@@ -1,7 +1,11 @@
 import copy
-import pandas as pd
-import plotly.graph_objs as go
-import plotly.express as px
+from collections import namedtuple
+
+import numpy as np
+
+from evaluation_cache import evaluation_key, model_version
+from parameters import perturbed_parameter_sets, stack_parameters
+from sensitivity import morris_elementary_effects, sobol_indices
 
 # Constants
 BASELINE_FEE = 100
@@ -15,11 +19,25 @@ CSAT_CHURN_REDUCTION = 0.15
 INITIAL_CUSTOMERS = 1000
 INITIAL_CSAT = 70
 
+# The constants as a parameter set (see parameters.py)
+Parameters = namedtuple("Parameters", ["BASELINE_FEE", "ORGANIC_CUSTOMERS", "BASE_CHURN_RATE", "INITIAL_CSAT", "CSAT_IMPROVEMENT",
+                                       "NEW_CUSTOMERS_PER_SALESPERSON", "CUSTOMERS_PER_ACCOUNT_MANAGER",
+                                       "REVENUE_INCREASE_RATE", "CSAT_CHURN_REDUCTION", "INITIAL_CUSTOMERS"])
+
+DEFAULT_PARAMETERS = Parameters(BASELINE_FEE, ORGANIC_CUSTOMERS, BASE_CHURN_RATE, INITIAL_CSAT, CSAT_IMPROVEMENT,
+                                NEW_CUSTOMERS_PER_SALESPERSON, CUSTOMERS_PER_ACCOUNT_MANAGER,
+                                REVENUE_INCREASE_RATE, CSAT_CHURN_REDUCTION, INITIAL_CUSTOMERS)
+
+# Constants perturbed by the sensitivity analysis
+SENSITIVITY_CONSTANTS = ["BASELINE_FEE", "ORGANIC_CUSTOMERS", "BASE_CHURN_RATE", "INITIAL_CSAT", "CSAT_IMPROVEMENT",
+                         "NEW_CUSTOMERS_PER_SALESPERSON", "CUSTOMERS_PER_ACCOUNT_MANAGER",
+                         "REVENUE_INCREASE_RATE", "CSAT_CHURN_REDUCTION"]
+
 # Function to calculate cumulative revenue
-def calculate_cumulative_revenue(employee_allocation, MONTHS):
-    customers = INITIAL_CUSTOMERS
+def calculate_cumulative_revenue(employee_allocation, MONTHS, parameters=DEFAULT_PARAMETERS):
+    customers = parameters.INITIAL_CUSTOMERS
     cumulative_revenue = 0
-    customer_revenues = [BASELINE_FEE] * int(customers)
+    customer_revenues = [parameters.BASELINE_FEE] * int(customers)
     customer_managed_months = [0] * int(customers)
 
     monthly_revenue_arr = []
@@ -27,33 +45,33 @@ def calculate_cumulative_revenue(employee_allocation, MONTHS):
         new_business, account_managers, support = employee_allocation[month]
 
         # Calculate CSAT and churn rate
-        csat = min(INITIAL_CSAT + (support * CSAT_IMPROVEMENT), 100)
-        churn_rate = BASE_CHURN_RATE * ((1 - CSAT_CHURN_REDUCTION) ** (csat - 70))
+        csat = min(parameters.INITIAL_CSAT + (support * parameters.CSAT_IMPROVEMENT), 100)
+        churn_rate = parameters.BASE_CHURN_RATE * ((1 - parameters.CSAT_CHURN_REDUCTION) ** (csat - 70))
 
         # Calculate new customers
-        new_customers = ORGANIC_CUSTOMERS + (new_business * NEW_CUSTOMERS_PER_SALESPERSON)
+        new_customers = parameters.ORGANIC_CUSTOMERS + (new_business * parameters.NEW_CUSTOMERS_PER_SALESPERSON)
 
         # Apply churn
         churned_customers = int(customers * churn_rate)
         customers = customers - churned_customers + int(new_customers)
 
         # Update customer revenues and managed months
-        new_customer_revenues = [BASELINE_FEE] * int(new_customers)
+        new_customer_revenues = [parameters.BASELINE_FEE] * int(new_customers)
         new_customer_managed_months = [0] * int(new_customers)
 
         customer_revenues = customer_revenues[:customers - int(new_customers)] + new_customer_revenues
         customer_managed_months = customer_managed_months[:customers - int(new_customers)] + new_customer_managed_months
 
-        accounts_managed = int(min(customers, account_managers * CUSTOMERS_PER_ACCOUNT_MANAGER))
+        accounts_managed = int(min(customers, account_managers * parameters.CUSTOMERS_PER_ACCOUNT_MANAGER))
         for i in range(accounts_managed):
             if customer_managed_months[i] < 6:
                 customer_managed_months[i] += 1
-            customer_revenues[i] = BASELINE_FEE * ((1 + REVENUE_INCREASE_RATE) ** customer_managed_months[i])
+            customer_revenues[i] = parameters.BASELINE_FEE * ((1 + parameters.REVENUE_INCREASE_RATE) ** customer_managed_months[i])
 
         # Reset managed months for unmanaged accounts
         for i in range(accounts_managed, customers):
             customer_managed_months[i] = 0
-            customer_revenues[i] = BASELINE_FEE
+            customer_revenues[i] = parameters.BASELINE_FEE
 
         # Calculate monthly revenue
         monthly_revenue = sum(customer_revenues)
@@ -62,30 +80,86 @@ def calculate_cumulative_revenue(employee_allocation, MONTHS):
 
     return cumulative_revenue
 
-# Sensitivity Analysis Function
-def sensitivity_analysis(base_allocations):
-    baseline_revenue = calculate_cumulative_revenue(base_allocations, len(base_allocations))
-
-    constants = {
-        "BASELINE_FEE": BASELINE_FEE,
-        "ORGANIC_CUSTOMERS": ORGANIC_CUSTOMERS,
-        "BASE_CHURN_RATE": BASE_CHURN_RATE,
-        "INITIAL_CSAT": INITIAL_CSAT,
-        "CSAT_IMPROVEMENT": CSAT_IMPROVEMENT,
-        "NEW_CUSTOMERS_PER_SALESPERSON": NEW_CUSTOMERS_PER_SALESPERSON,
-        "CUSTOMERS_PER_ACCOUNT_MANAGER": CUSTOMERS_PER_ACCOUNT_MANAGER,
-        "REVENUE_INCREASE_RATE": REVENUE_INCREASE_RATE,
-        "CSAT_CHURN_REDUCTION": CSAT_CHURN_REDUCTION
-    }
+# Simulate the allocation under many parameter sets at once: parameter_sets is a Parameters of
+# (sets,) arrays (see stack_parameters). Like revenue.py, the customer list is kept as a histogram
+# of customer counts per managed-month level (0-6): managed customers sit at the front of the list
+# with the longest managed streaks first, so churn drops the lowest levels first and account
+# managers take the highest. Returns the cumulative revenues (sets,); they agree with
+# calculate_cumulative_revenue up to floating point summation order.
+def simulate_parameter_sets(employee_allocation, MONTHS, parameter_sets):
+    sets = len(parameter_sets.BASELINE_FEE)
+    levels = np.arange(7)
+    level_revenues = parameter_sets.BASELINE_FEE[:, None] * ((1 + parameter_sets.REVENUE_INCREASE_RATE[:, None]) ** levels)
+
+    managed_histograms = np.zeros((sets, 7))
+    managed_histograms[:, 0] = np.trunc(parameter_sets.INITIAL_CUSTOMERS)
+    cumulative_revenue = np.zeros(sets)
 
-    impacts = []
+    for month in range(MONTHS):
+        new_business, account_managers, support = employee_allocation[month]
+
+        # Calculate CSAT and churn rate
+        csat = np.minimum(parameter_sets.INITIAL_CSAT + (support * parameter_sets.CSAT_IMPROVEMENT), 100)
+        churn_rate = parameter_sets.BASE_CHURN_RATE * ((1 - parameter_sets.CSAT_CHURN_REDUCTION) ** (csat - 70))
+
+        # Calculate new customers
+        new_customers = np.trunc(parameter_sets.ORGANIC_CUSTOMERS + (new_business * parameter_sets.NEW_CUSTOMERS_PER_SALESPERSON))
+
+        # Apply churn, dropping customers from the back of the list (lowest levels first)
+        remaining_churn = np.trunc(managed_histograms.sum(axis=1) * churn_rate)
+        for level in levels:
+            dropped = np.minimum(managed_histograms[:, level], remaining_churn)
+            managed_histograms[:, level] -= dropped
+            remaining_churn -= dropped
+
+        # New customers join at the back of the list, unmanaged
+        managed_histograms[:, 0] += new_customers
+
+        # Account managers take the front of the list; everyone else is reset to unmanaged
+        accounts_managed = np.trunc(np.minimum(managed_histograms.sum(axis=1), account_managers * parameter_sets.CUSTOMERS_PER_ACCOUNT_MANAGER))
+        advanced_histograms = np.zeros_like(managed_histograms)
+        for level in levels[::-1]:
+            managed = np.minimum(managed_histograms[:, level], accounts_managed)
+            accounts_managed -= managed
+            advanced_histograms[:, min(level + 1, 6)] += managed
+            advanced_histograms[:, 0] += managed_histograms[:, level] - managed
+        managed_histograms = advanced_histograms
+
+        # Calculate monthly revenue
+        cumulative_revenue += (managed_histograms * level_revenues).sum(axis=1)
+
+    return cumulative_revenue
+
+# Cumulative revenues of the allocation under each of parameter_sets (a list), simulating only the
+# parameter sets an EvaluationCache (evaluation_cache.py) has not seen with this version of the model
+def cached_cumulative_revenues(employee_allocation, MONTHS, parameter_sets, cache):
+    model = model_version(__file__)
+    keys = [evaluation_key(model, parameter_set, employee_allocation[:MONTHS]) for parameter_set in parameter_sets]
+    simulate = lambda indices: {"cumulative_revenue": simulate_parameter_sets(
+        employee_allocation, MONTHS, stack_parameters([parameter_sets[index] for index in indices]))}
+    return [float(value[0]) for value in cache.evaluate(keys, ["cumulative_revenue"], simulate)["cumulative_revenue"]]
+
+# Sensitivity Analysis Function; given an EvaluationCache, reuses the revenues of earlier runs
+def sensitivity_analysis(base_allocations, parameters=DEFAULT_PARAMETERS, cache=None):
+    import pandas as pd
+
+    # Revenue of the baseline, then of each sensitivity constant increased and decreased by 10%
     perturbation_factor = 0.1
+    parameter_sets = perturbed_parameter_sets(parameters, perturbation_factor, SENSITIVITY_CONSTANTS)
+    if cache is None:
+        revenues = simulate_parameter_sets(base_allocations, len(base_allocations), stack_parameters(parameter_sets)).tolist()
+    else:
+        revenues = cached_cumulative_revenues(base_allocations, len(base_allocations), parameter_sets, cache)
+    baseline_revenue = revenues[0]
 
-    for constant, original_value in constants.items():
-        # Increase the constant by 1%
-        increased_value = original_value * (1 + perturbation_factor)
-        globals()[constant] = increased_value
-        increased_revenue = calculate_cumulative_revenue(base_allocations, len(base_allocations))
+    impacts = []
+
+    for index, constant in enumerate(SENSITIVITY_CONSTANTS):
+        original_value = getattr(parameters, constant)
+
+        # Increase the constant by 10%
+        increased_value = getattr(parameter_sets[2 * index + 1], constant)
+        increased_revenue = revenues[2 * index + 1]
         increased_percentage_change = ((increased_revenue - baseline_revenue) / baseline_revenue) * 100
 
         impacts.append({
@@ -97,10 +171,9 @@ def sensitivity_analysis(base_allocations):
             "Percentage Change": increased_percentage_change
         })
 
-        # Decrease the constant by 1%
-        decreased_value = original_value * (1 - perturbation_factor)
-        globals()[constant] = decreased_value
-        decreased_revenue = calculate_cumulative_revenue(base_allocations, len(base_allocations))
+        # Decrease the constant by 10%
+        decreased_value = getattr(parameter_sets[2 * index + 2], constant)
+        decreased_revenue = revenues[2 * index + 2]
         decreased_percentage_change = ((decreased_revenue - baseline_revenue) / baseline_revenue) * 100
 
         impacts.append({
@@ -112,8 +185,6 @@ def sensitivity_analysis(base_allocations):
             "Percentage Change": decreased_percentage_change
         })
 
-        globals()[constant] = original_value
-
     impacts_df = pd.DataFrame(impacts)
     
     # Print the table
@@ -125,16 +196,59 @@ def sensitivity_analysis(base_allocations):
 
     return most_impactful_constant, impacts_df
 
-# Example monthly allocations for 12 months
-monthly_allocations = [[12, 0, 8], [13, 0, 7], [13, 0, 7], [12, 0, 8], [12, 0, 8], [12, 0, 8], [11, 0, 9], [11, 0, 9], [12, 0, 8], [10, 0, 10], [11, 0, 9], [11, 0, 9], [9, 1, 10], [7, 3, 10], [0, 8, 12], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 12, 8], [0, 13, 7]]
-most_impactful_constant, impacts_df = sensitivity_analysis(monthly_allocations)
-
-print("Most impactful constant:", most_impactful_constant)
-
-# Plot graphs for each variable
-fig = px.bar(impacts_df, x="Constant", y="Percentage Change", color="Perturbation",
-             title="Sensitivity Analysis of Revenue Impact",
-             labels={"Percentage Change": "Percentage Change in Revenue"})
-
-fig.show()
-fig.write_html("graphs/htmls/sensitivity_analysis.html")
+# Global sensitivity analysis: Sobol indices of the cumulative revenue over joint samples of the
+# constants within 10% of their values, and Morris elementary effects as a cheaper screening
+def global_sensitivity_analysis(base_allocations, samples=100000, trajectories=1000, parameters=DEFAULT_PARAMETERS, seed=0):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    model = lambda parameter_sets: simulate_parameter_sets(base_allocations, len(base_allocations), parameter_sets)
+    sobol = sobol_indices(model, parameters, SENSITIVITY_CONSTANTS, samples, 0.1, rng)
+    morris = morris_elementary_effects(model, parameters, SENSITIVITY_CONSTANTS, trajectories, 0.1, rng=rng)
+
+    indices_df = pd.DataFrame({
+        "Constant": sobol.constants,
+        "First Order": sobol.first_order,
+        "First Order 95% CI": sobol.first_order_confidence,
+        "Total Order": sobol.total_order,
+        "Total Order 95% CI": sobol.total_order_confidence,
+        "Morris mu*": morris.mu_star,
+        "Morris sigma": morris.sigma
+    })
+    print(indices_df)
+
+    # Indices at growing sample sizes; they should settle as the samples grow
+    convergence_df = pd.DataFrame(sobol.total_order_history, index=sobol.sample_sizes, columns=sobol.constants)
+    convergence_df.index.name = "Samples"
+    print(convergence_df)
+
+    return indices_df, convergence_df
+
+if __name__ == "__main__":
+    import plotly.express as px
+
+    from evaluation_cache import EvaluationCache
+
+    # Example monthly allocations for 12 months
+    monthly_allocations = [[12, 0, 8], [13, 0, 7], [13, 0, 7], [12, 0, 8], [12, 0, 8], [12, 0, 8], [11, 0, 9], [11, 0, 9], [12, 0, 8], [10, 0, 10], [11, 0, 9], [11, 0, 9], [9, 1, 10], [7, 3, 10], [0, 8, 12], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 11, 9], [0, 12, 8], [0, 13, 7]]
+
+    most_impactful_constant, impacts_df = sensitivity_analysis(monthly_allocations, cache=EvaluationCache())
+
+    print("Most impactful constant:", most_impactful_constant)
+
+    # Plot graphs for each variable
+    fig = px.bar(impacts_df, x="Constant", y="Percentage Change", color="Perturbation",
+                 title="Sensitivity Analysis of Revenue Impact",
+                 labels={"Percentage Change": "Percentage Change in Revenue"})
+
+    fig.show()
+    fig.write_html("graphs/htmls/sensitivity_analysis.html")
+
+    # Also rank the constants by Sobol indices over joint perturbations, which capture their interactions
+    GLOBAL_SENSITIVITY = False
+    if GLOBAL_SENSITIVITY:
+        indices_df, convergence_df = global_sensitivity_analysis(monthly_allocations)
+        fig = px.bar(indices_df, x="Constant", y=["First Order", "Total Order"], barmode="group",
+                     title="Sobol Indices of Revenue")
+        fig.show()
+        fig.write_html("graphs/htmls/sobol_indices.html")
@@ -0,0 +1,159 @@
+import time
+
+import numpy as np
+
+from revenue import (BASE_CHURN_RATE, CSAT_CHURN_REDUCTION, INITIAL_CSAT, MANAGED_MONTH_REVENUE_ARRAY, MAX_MANAGED_MONTHS,
+                     ORGANIC_GROWTH, advance_managed_histograms)
+
+NUM_MONTHS = 24
+
+# Organisation used by the large-scale example at the bottom
+LARGE_SCALE_EMPLOYEES = 500
+LARGE_SCALE_CUSTOMERS = 100000
+
+# Plans are optimised as monthly role fractions, kept on the simplex as a softmax of logits, with
+# Adam steps on the logits. Every step simulates all starts and their finite-difference
+# neighbours in one batch, so a step costs O(months) rows of months simulated each, whatever
+# the number of employees.
+RELAXATION_STARTS = 4
+RELAXATION_STEPS = 200
+RELAXATION_LEARNING_RATE = 0.05
+FINITE_DIFFERENCE_STEP = 1e-4
+
+# Local repair after rounding moves this share of the employees between two roles in one month
+# at a time, halving the move down to one employee whenever no move improves the plan
+REPAIR_MOVE_FRACTION = 0.05
+
+# The six (from role, to role) moves tried for every month during repair
+ROLE_MOVES = [(source, target) for source in range(3) for target in range(3) if source != target]
+
+# Initial managed-month histogram of a customer base of the given size
+def initial_histogram(initial_customers):
+    return np.array([initial_customers] + [0] * MAX_MANAGED_MONTHS)
+
+# Smooth version of advance_managed_histograms for fractional histograms and headcounts, shape
+# (population, 7) and (population, 3): churn is not truncated to whole customers and the churn
+# rate follows the support headcount continuously up to the CSAT cap
+def advance_relaxed_histograms(managed_histograms, allocations):
+    new_business, account_managers, support = allocations.T
+    churn_rate = BASE_CHURN_RATE * (1 - CSAT_CHURN_REDUCTION) ** np.minimum(support, 100 - INITIAL_CSAT)
+    histograms = managed_histograms.T.copy()
+
+    # Drop churned customers from the lowest levels first
+    remaining_churn = histograms.sum(axis=0) * churn_rate
+    for level in range(MAX_MANAGED_MONTHS + 1):
+        dropped = np.minimum(histograms[level], remaining_churn)
+        histograms[level] -= dropped
+        remaining_churn -= dropped
+
+    histograms[0] += ORGANIC_GROWTH + new_business * 5
+
+    # Account managers take the highest levels; everyone else is reset to unmanaged
+    accounts_managed = np.minimum(histograms.sum(axis=0), account_managers * 25)
+    advanced_histograms = np.zeros_like(histograms)
+    for level in range(MAX_MANAGED_MONTHS, -1, -1):
+        managed = np.minimum(histograms[level], accounts_managed)
+        accounts_managed -= managed
+        advanced_histograms[min(level + 1, MAX_MANAGED_MONTHS)] += managed
+        advanced_histograms[0] += histograms[level] - managed
+
+    return advanced_histograms.T
+
+# Cumulative revenue of a batch of plans, shape (population, months, 3), from a customer base of
+# initial_customers, with the relaxed model (fractional headcounts) or the exact one (integers)
+def plan_revenues(allocations, initial_customers, relaxed=False):
+    population, months, _ = allocations.shape
+    histograms = np.tile(initial_histogram(initial_customers).astype(np.float64 if relaxed else np.int64), (population, 1))
+    cumulative_revenues = np.zeros(population)
+    for month in range(months):
+        if relaxed:
+            histograms = advance_relaxed_histograms(histograms, allocations[:, month])
+        else:
+            histograms, _, _ = advance_managed_histograms(histograms, allocations[:, month])
+        cumulative_revenues += histograms @ MANAGED_MONTH_REVENUE_ARRAY
+    return cumulative_revenues
+
+# Role fractions of logits, shape (..., months, 3)
+def role_fractions(logits):
+    exponentials = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exponentials / exponentials.sum(axis=-1, keepdims=True)
+
+# Relaxed revenues of the plans given by logits, shape (starts, months, 3), and their gradients
+# with respect to the logits by central differences, all simulated in one batch
+def relaxed_revenue_gradients(logits, total_employees, initial_customers, step=FINITE_DIFFERENCE_STEP):
+    starts, months, _ = logits.shape
+    offsets = np.eye(months * 3).reshape(months * 3, months, 3) * step
+    batch = np.concatenate([logits[:, None], logits[:, None] + offsets, logits[:, None] - offsets], axis=1)
+    revenues = plan_revenues(role_fractions(batch.reshape(-1, months, 3)) * total_employees, initial_customers,
+                             relaxed=True).reshape(starts, -1)
+    gradients = (revenues[:, 1:1 + months * 3] - revenues[:, 1 + months * 3:]) / (2 * step)
+    return revenues[:, 0], gradients.reshape(starts, months, 3)
+
+# Round role fractions, shape (months, 3), to whole headcounts that add up to total_employees in
+# every month, giving the remaining employees to the roles with the largest remainders
+def round_headcounts(fractions, total_employees):
+    headcounts = fractions * total_employees
+    rounded = np.floor(headcounts).astype(np.int64)
+    remainders = headcounts - rounded
+    shortfalls = total_employees - rounded.sum(axis=1)
+    for month, role_order in enumerate(np.argsort(-remainders, axis=1)):
+        rounded[month, role_order[:shortfalls[month]]] += 1
+    return rounded
+
+# Hill-climb a plan of whole headcounts, shape (months, 3), with the exact model: every round
+# tries moving the current move size between every pair of roles in every month in one batch and
+# keeps the best improving move. Returns the plan and its cumulative revenue.
+def repair_plan(plan, initial_customers, move_fraction=REPAIR_MOVE_FRACTION):
+    months = len(plan)
+    revenue = plan_revenues(plan[None], initial_customers)[0]
+    move = max(1, int(plan[0].sum() * move_fraction))
+    while True:
+        candidates = np.repeat(plan[None], months * len(ROLE_MOVES), axis=0)
+        for month in range(months):
+            for index, (source, target) in enumerate(ROLE_MOVES):
+                candidate = candidates[month * len(ROLE_MOVES) + index]
+                moved = min(move, candidate[month, source])
+                candidate[month, source] -= moved
+                candidate[month, target] += moved
+        revenues = plan_revenues(candidates, initial_customers)
+        best = np.argmax(revenues)
+        if revenues[best] > revenue:
+            plan, revenue = candidates[best], revenues[best]
+        elif move > 1:
+            move //= 2
+        else:
+            return plan, revenue
+
+# Optimise a plan for an organisation of total_employees serving initial_customers: Adam on the
+# relaxed model from several starts (an even split and random ones), then the best relaxed plan is
+# rounded to whole headcounts and repaired with the exact model. Returns the plan, shape
+# (months, 3), and its exact cumulative revenue.
+def optimize_relaxed(months=NUM_MONTHS, total_employees=LARGE_SCALE_EMPLOYEES, initial_customers=LARGE_SCALE_CUSTOMERS,
+                     starts=RELAXATION_STARTS, steps=RELAXATION_STEPS, learning_rate=RELAXATION_LEARNING_RATE, rng=None,
+                     verbose=True):
+    rng = np.random.default_rng() if rng is None else rng
+    logits = rng.normal(size=(starts, months, 3))
+    logits[0] = 0
+    first_moment = np.zeros_like(logits)
+    second_moment = np.zeros_like(logits)
+
+    for step in range(1, steps + 1):
+        revenues, gradients = relaxed_revenue_gradients(logits, total_employees, initial_customers)
+        first_moment = 0.9 * first_moment + 0.1 * gradients
+        second_moment = 0.999 * second_moment + 0.001 * gradients ** 2
+        logits += learning_rate * (first_moment / (1 - 0.9 ** step)) / (np.sqrt(second_moment / (1 - 0.999 ** step)) + 1e-12)
+        if verbose and (step % 20 == 0 or step == steps):
+            print(f"Step {step} | best relaxed revenue {revenues.max():,.2f}")
+
+    revenues = plan_revenues(role_fractions(logits) * total_employees, initial_customers, relaxed=True)
+    fractions = role_fractions(logits[np.argmax(revenues)])
+    plan, revenue = repair_plan(round_headcounts(fractions, total_employees), initial_customers)
+    if verbose:
+        print(f"Relaxed revenue {revenues.max():,.2f} | rounded and repaired revenue {revenue:,.2f}")
+    return plan, revenue
+
+if __name__ == "__main__":
+    start_time = time.time()
+    plan, revenue = optimize_relaxed()
+    print(f"Plan for {LARGE_SCALE_EMPLOYEES} employees and {LARGE_SCALE_CUSTOMERS:,} customers over {NUM_MONTHS} months: {plan.tolist()}")
+    print(f"Cumulative revenue: ${revenue:,.2f} ({time.time() - start_time:.1f}s)")
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import namedtuple
+
+# Headless batch rendering of figures: no figure is shown or opened in a browser, figures are
+# written by worker processes, and every worker exports all of its images with one call to
+# plotly.io.write_images, so one kaleido browser session serves all of them. A manifest records
+# the digest of every figure's spec (data and layout) per output file; figures whose digest
+# matches a file already on disk are skipped.
+
+RENDER_WORKERS = os.cpu_count()
+RENDER_MANIFEST = "graphs/render_manifest.json"
+
+# A figure to render: a plotly figure and the files to write it to (.html, or an image format
+# kaleido supports such as .png)
+FigureJob = namedtuple("FigureJob", ["figure", "paths"])
+
+def figure_digest(figure_json):
+    return hashlib.blake2b(figure_json.encode(), digest_size=16).hexdigest()
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+# Write the manifest through a temporary file so an interrupted run never leaves it half written
+def save_manifest(manifest, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+# Write a group of figures, given as (figure JSON, paths), in a worker; returns the paths written.
+# Without images only the HTML files are written.
+def render_group(task):
+    import plotly.io as pio
+
+    jobs, images = task
+    image_figures = []
+    image_paths = []
+    written = []
+    for figure_json, paths in jobs:
+        figure = pio.from_json(figure_json)
+        for path in paths:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            if path.endswith(".html"):
+                figure.write_html(path, auto_open=False)
+                written.append(path)
+            elif images:
+                image_figures.append(figure)
+                image_paths.append(path)
+    if image_paths:
+        pio.write_images(image_figures, image_paths)
+        written.extend(image_paths)
+    return written
+
+# Render the jobs whose figures changed since they were last written (or whose files are missing)
+# on up to `workers` processes. Returns the number of figures rendered and skipped.
+def render_figures(jobs, workers=RENDER_WORKERS, manifest_path=RENDER_MANIFEST, images=True):
+    manifest = load_manifest(manifest_path)
+    pending = []
+    digests = {}
+    for job in jobs:
+        figure_json = job.figure.to_json()
+        digest = figure_digest(figure_json)
+        paths = [path for path in job.paths if images or path.endswith(".html")]
+        if all(manifest.get(path) == digest and os.path.exists(path) for path in paths):
+            continue
+        pending.append((figure_json, paths))
+        digests.update((path, digest) for path in paths)
+
+    # One group per worker, balanced by number of figures
+    groups = [pending[worker::workers] for worker in range(min(workers, len(pending)))]
+    tasks = [(group, images) for group in groups]
+    pool = multiprocessing.Pool(len(tasks)) if len(tasks) > 1 else None
+    try:
+        results = map(render_group, tasks) if pool is None else pool.imap_unordered(render_group, tasks)
+        for written in results:
+            manifest.update((path, digests[path]) for path in written)
+            save_manifest(manifest, manifest_path)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return len(pending), len(jobs) - len(pending)
+
+if __name__ == "__main__":
+    import argparse
+
+    import graph
+    import graph_clv
+    from results import ResultsStore
+
+    parser = argparse.ArgumentParser(description="Regenerate the figures in graphs/ headlessly, skipping unchanged ones.")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS)
+    parser.add_argument("--no-images", action="store_true", help="only write the HTML figures")
+    args = parser.parse_args()
+
+    # CLV figures of the stored 120 month runs of the 24 and 120 month optima at both lengths, and the
+    # CLV sensitivity figures of graph_clv's example allocation
+    store = ResultsStore()
+    monthly_clvs_24 = store.load("24 Months optimized 1 (50,10000)", 120, "monthly_clv")
+    monthly_clvs_120 = store.load("120 Months optimized", 120, "monthly_clv")
+    jobs = graph.figure_jobs(monthly_clvs_24[:24], monthly_clvs_120[:24]) + graph.figure_jobs(monthly_clvs_24, monthly_clvs_120)
+    jobs += graph_clv.figure_jobs(graph_clv.EXAMPLE_ALLOCATIONS)
+
+    rendered, skipped = render_figures(jobs, args.workers, images=not args.no_images)
+    print(f"Rendered {rendered} figures, skipped {skipped} unchanged")
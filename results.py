@@ -0,0 +1,109 @@
+import ast
+import csv
+import hashlib
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# Directory of the results store the scripts write to and plot from
+RESULTS_PATH = "graphs/data/results"
+
+# A store keeps every series as float64 values, one series after another, in a single raw binary
+# file that is only ever appended to and is read through a memory map, so loading a series copies
+# nothing. A CSV index maps (plan, months, parameters, series) to the offset and length of the
+# series in that file. Appending a key again with the same values writes nothing; with new values
+# it adds a new row, and the last row for a key wins.
+VALUES_FILE = "values.f64"
+INDEX_FILE = "index.csv"
+INDEX_COLUMNS = ["plan", "months", "parameters", "series", "offset", "length"]
+
+SeriesKey = namedtuple("SeriesKey", ["plan", "months", "parameters", "series"])
+
+# Parameters key of runs with a model's built-in constants
+DEFAULT_PARAMETERS_KEY = "default"
+
+# Series names of the text dumps revenue.py used to write, by file name suffix
+TEXT_DUMP_SERIES = {"_montlhy_revenue.txt": "monthly_revenue", "_lifetime_value.txt": "monthly_clv"}
+
+# Parameters key of a parameter set (see parameters.py): a short digest of its values
+def parameter_key(parameters=None):
+    if parameters is None:
+        return DEFAULT_PARAMETERS_KEY
+    return hashlib.blake2b(np.asarray(parameters, dtype=np.float64).tobytes(), digest_size=8).hexdigest()
+
+class ResultsStore:
+    def __init__(self, path=RESULTS_PATH):
+        self.path = path
+        self.index = {}
+        self.values = None
+        if os.path.exists(os.path.join(path, INDEX_FILE)):
+            with open(os.path.join(path, INDEX_FILE), newline="") as file:
+                for row in csv.DictReader(file):
+                    key = SeriesKey(row["plan"], int(row["months"]), row["parameters"], row["series"])
+                    self.index[key] = (int(row["offset"]), int(row["length"]))
+
+    def keys(self):
+        return list(self.index)
+
+    # Append the series (name -> 1-D values) of one run of a plan over months with a parameter set
+    # (None for the model's built-in constants), skipping series already stored with the same
+    # values, so rerunning a script does not grow the store. Values are written before their index
+    # rows, so an interrupted append leaves the store readable.
+    def append(self, plan, months, series, parameters=None):
+        changed = {}
+        for name, values in series.items():
+            values = np.ascontiguousarray(values, dtype=np.float64).ravel()
+            key = SeriesKey(plan, int(months), parameter_key(parameters), name)
+            if key not in self.index or not np.array_equal(self.series(key), values):
+                changed[key] = values
+        if not changed:
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        rows = []
+        with open(os.path.join(self.path, VALUES_FILE), "ab") as file:
+            for key, values in changed.items():
+                rows.append(list(key) + [file.tell() // 8, len(values)])
+                file.write(values.tobytes())
+
+        index_path = os.path.join(self.path, INDEX_FILE)
+        write_header = not os.path.exists(index_path) or os.path.getsize(index_path) == 0
+        with open(index_path, "a", newline="") as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(INDEX_COLUMNS)
+            writer.writerows(rows)
+
+        for plan, months, parameters_key, name, offset, length in rows:
+            self.index[SeriesKey(plan, months, parameters_key, name)] = (offset, length)
+        # The memory map only covers the file as it was when mapped
+        self.values = None
+
+    # A stored series as a read-only view into the memory-mapped values file
+    def load(self, plan, months, series, parameters=None):
+        return self.series(SeriesKey(plan, int(months), parameter_key(parameters), series))
+
+    def series(self, key):
+        offset, length = self.index[key]
+        if self.values is None:
+            self.values = np.memmap(os.path.join(self.path, VALUES_FILE), dtype=np.float64, mode="r")
+        return self.values[offset:offset + length]
+
+# Move the str(list) text dumps in directory (see TEXT_DUMP_SERIES) into the store, one run per plan
+# over as many months as the dump has values, and return the paths of the converted files
+def import_text_dumps(directory, store):
+    converted = []
+    for file_name in sorted(os.listdir(directory)):
+        for suffix, series in TEXT_DUMP_SERIES.items():
+            if file_name.endswith(suffix):
+                path = os.path.join(directory, file_name)
+                with open(path) as file:
+                    values = ast.literal_eval(file.read())
+                store.append(file_name[:-len(suffix)], len(values), {series: values})
+                converted.append(path)
+    return converted
+
+if __name__ == "__main__":
+    for path in import_text_dumps("graphs/data", ResultsStore()):
+        print(f"Imported {path}")
@@ -1,3 +1,8 @@
+from collections import namedtuple
+from itertools import chain, cycle, islice, repeat
+
+import numpy as np
+
 # Initialize constants
     
 
@@ -8,54 +13,60 @@ BASE_REVENUE = 100
 INITIAL_CSAT = 70
 CSAT_CHURN_REDUCTION = 0.15
 
-def calculate_cumulative_revenue(employee_allocation,MONTHS):
-    
-    # Initialize variables
-    customers = INITIAL_CUSTOMERS
-    cumulative_revenue = 0
-    customer_revenues = [BASE_REVENUE] * customers
-    customer_managed_months = [0] * customers
-
-    monthly_revenue_arr =[]
-    for month in range(MONTHS):
-        new_business, account_managers, support = employee_allocation[month]
-        
-        # Calculate CSAT and churn rate
-        csat = min(INITIAL_CSAT + support, 100)
-        churn_rate = BASE_CHURN_RATE * ((1-CSAT_CHURN_REDUCTION) ** ((csat - INITIAL_CSAT) / 1))
-        
-        # Calculate new customers
-        new_customers = ORGANIC_GROWTH + (new_business * 5)
-        
-        # Apply churn
-        churned_customers = int(customers * churn_rate)
-        customers = customers - churned_customers + new_customers
-        
-        # Update customer revenues and managed months
-        new_customer_revenues = [BASE_REVENUE] * new_customers
-        new_customer_managed_months = [0] * new_customers
-        
-        customer_revenues = customer_revenues[:customers - new_customers] + new_customer_revenues
-        customer_managed_months = customer_managed_months[:customers - new_customers] + new_customer_managed_months
-       
-        
-        accounts_managed = min(customers, account_managers * 25)
-        for i in range(accounts_managed):
-            if customer_managed_months[i] < 6:
-                customer_managed_months[i] += 1
-            customer_revenues[i] = BASE_REVENUE * (1.2 ** customer_managed_months[i])
-        
-        # Reset managed months for unmanaged accounts
-        for i in range(accounts_managed, customers):
-            customer_managed_months[i] = 0
-            customer_revenues[i] = BASE_REVENUE
-        
-        # Calculate monthly revenue
-        monthly_revenue = sum(customer_revenues)
-        monthly_revenue_arr.append(monthly_revenue)
-        cumulative_revenue += monthly_revenue
+MAX_MANAGED_MONTHS = 6
+
+# Revenue of a customer by number of consecutive managed months (index 0 = unmanaged)
+MANAGED_MONTH_REVENUES = [BASE_REVENUE] + [BASE_REVENUE * (1.2 ** months) for months in range(1, MAX_MANAGED_MONTHS + 1)]
+
+# Customers only differ by how many months in a row they have been managed (their level,
+# 0 = unmanaged up to MAX_MANAGED_MONTHS), and the customer list is always ordered by level,
+# highest first. The whole customer base is therefore described by a histogram of customer
+# counts indexed by level; the list it stands for is read from the last index down to index 0.
+
+# Advance the managed-month histogram by one month of an allocation
+def advance_managed_histogram(managed_histogram, new_business, account_managers, support):
+    customers = sum(managed_histogram)
+
+    # Calculate CSAT and churn rate
+    csat = min(INITIAL_CSAT + support, 100)
+    churn_rate = BASE_CHURN_RATE * ((1-CSAT_CHURN_REDUCTION) ** ((csat - INITIAL_CSAT) / 1))
+
+    # Calculate new customers
+    new_customers = ORGANIC_GROWTH + (new_business * 5)
 
-    return cumulative_revenue, monthly_revenue_arr
+    # Apply churn, dropping customers from the back of the list (lowest levels first)
+    churned_customers = int(customers * churn_rate)
+    histogram = list(managed_histogram)
+    remaining_churn = churned_customers
+    level = 0
+    while remaining_churn > 0:
+        dropped = min(histogram[level], remaining_churn)
+        histogram[level] -= dropped
+        remaining_churn -= dropped
+        level += 1
+
+    # New customers join at the back of the list, unmanaged
+    histogram[0] += new_customers
+    customers = sum(histogram)
+
+    # Account managers take the front of the list; everyone else is reset to unmanaged
+    accounts_managed = min(customers, account_managers * 25)
+    advanced_histogram = [0] * (MAX_MANAGED_MONTHS + 1)
+    for level in range(MAX_MANAGED_MONTHS, -1, -1):
+        managed = min(histogram[level], accounts_managed)
+        accounts_managed -= managed
+        advanced_histogram[min(level + 1, MAX_MANAGED_MONTHS)] += managed
+        advanced_histogram[0] += histogram[level] - managed
+
+    return advanced_histogram, churn_rate, churned_customers
+
+# Total revenue of a managed-month histogram
+def managed_histogram_revenue(managed_histogram):
+    # Sum the customers one by one in list order so the floating point result is bit-identical
+    # to summing the per-customer revenue list. This costs O(customers); the batched simulators
+    # use histograms @ MANAGED_MONTH_REVENUE_ARRAY, which is O(levels) but rounds differently.
+    return sum(chain.from_iterable(repeat(MANAGED_MONTH_REVENUES[level], managed_histogram[level])
+                                   for level in range(MAX_MANAGED_MONTHS, -1, -1)))
 
 def calculate_clv(arpu, customer_churn_rate):
     avg_revenue_of_churned_customers = 100
@@ -69,54 +80,228 @@ def calculate_clv(arpu, customer_churn_rate):
     
     return clv
 
-def calculate_avg_clv(employee_allocation,MONTHS):
-    clv_arr = []
-    # Initialize variables
-    customers = INITIAL_CUSTOMERS
-    cumulative_revenue = 0
-    customer_revenues = [BASE_REVENUE] * customers
-    customer_managed_months = [0] * customers
-
-    for month in range(MONTHS):
-        new_business, account_managers, support = employee_allocation[month]
-        
-        # Calculate CSAT and churn rate
-        csat = min(INITIAL_CSAT + support, 100)
-        churn_rate = BASE_CHURN_RATE * ((1-CSAT_CHURN_REDUCTION) ** ((csat - INITIAL_CSAT) / 1))
-        
-        # Calculate new customers
-        new_customers = ORGANIC_GROWTH + (new_business * 5)
-        
-        # Apply churn
-        churned_customers = int(customers * churn_rate)
-        customers = customers - churned_customers + new_customers
-        
-        # Update customer revenues and managed months
-        new_customer_revenues = [BASE_REVENUE] * new_customers
-        new_customer_managed_months = [0] * new_customers
-        
-        customer_revenues = customer_revenues[:customers - new_customers] + new_customer_revenues
-        customer_managed_months = customer_managed_months[:customers - new_customers] + new_customer_managed_months
-       
-        
-        accounts_managed = min(customers, account_managers * 25)
-        for i in range(accounts_managed):
-            if customer_managed_months[i] < 6:
-                customer_managed_months[i] += 1
-            customer_revenues[i] = BASE_REVENUE * (1.2 ** customer_managed_months[i])
-        
-        # Reset managed months for unmanaged accounts
-        for i in range(accounts_managed, customers):
-            customer_managed_months[i] = 0
-            customer_revenues[i] = BASE_REVENUE
+# State of a simulation at the start of a month; later months depend on nothing else
+SimulationState = namedtuple("SimulationState", ["month", "customers", "managed_histogram", "cumulative_revenue"])
+
+INITIAL_STATE = SimulationState(0, INITIAL_CUSTOMERS, (INITIAL_CUSTOMERS,) + (0,) * MAX_MANAGED_MONTHS, 0)
+
+# Everything one simulation of an allocation produces
+SimulationResult = namedtuple("SimulationResult", ["cumulative_revenue", "monthly_revenue", "monthly_clv", "avg_clv",
+                                                   "monthly_churn", "monthly_customers", "states"])
+
+# One simulated month: its revenue, CLV, churned customers, customer count and the state at its end
+SimulatedMonth = namedtuple("SimulatedMonth", ["revenue", "clv", "churn", "customers", "state"])
+
+# Simulate month by month from initial_state, yielding one SimulatedMonth per allocation drawn
+# from monthly_allocations (any iterable, e.g. islice(cycle(pattern), months)). Only the current
+# managed-month histogram is kept, so memory stays constant whatever the horizon or customer count.
+def stream_simulation(monthly_allocations, initial_state=INITIAL_STATE):
+    managed_histogram = list(initial_state.managed_histogram)
+    cumulative_revenue = initial_state.cumulative_revenue
+    month = initial_state.month
+
+    for new_business, account_managers, support in monthly_allocations:
+        managed_histogram, churn_rate, churned_customers = advance_managed_histogram(managed_histogram, new_business, account_managers, support)
+        customers = sum(managed_histogram)
         
         # Calculate monthly revenue
-        monthly_revenue = sum(customer_revenues)
-        
-        monthly_clv = calculate_clv(monthly_revenue/customers, churn_rate)
-        clv_arr.append(monthly_clv)
+        monthly_revenue = managed_histogram_revenue(managed_histogram)
+        cumulative_revenue += monthly_revenue
+        month += 1
 
-    return  sum(clv_arr)/len(clv_arr),clv_arr
+        yield SimulatedMonth(monthly_revenue, calculate_clv(monthly_revenue/customers, churn_rate), churned_customers,
+                             customers, SimulationState(month, customers, tuple(managed_histogram), cumulative_revenue))
+
+# Cumulative revenue, average CLV and number of months of a stream of SimulatedMonths, without
+# keeping the months
+def stream_totals(simulated_months, initial_state=INITIAL_STATE):
+    cumulative_revenue = initial_state.cumulative_revenue
+    clv_total = 0
+    months = 0
+    for simulated_month in simulated_months:
+        cumulative_revenue = simulated_month.state.cumulative_revenue
+        clv_total += simulated_month.clv
+        months += 1
+    return cumulative_revenue, clv_total / months if months else 0, months
+
+# A plan that repeats pattern (e.g. 12 months) for the given number of months, as an iterator
+def repeat_plan(pattern, months):
+    return islice(cycle(pattern), months)
+
+# Simulate an allocation once, recording revenue, CLV, churned customers, customer counts and
+# the simulation state after every month. Passing one of those states as initial_state resumes
+# the simulation from it; the monthly series then only cover the resumed months. Resuming from
+# a state at or past MONTHS simulates nothing and returns the state's cumulative revenue with
+# empty series and an average CLV of 0.
+def simulate(employee_allocation,MONTHS,initial_state=INITIAL_STATE):
+    simulated_months = list(stream_simulation(employee_allocation[initial_state.month:MONTHS], initial_state))
+    cumulative_revenue = simulated_months[-1].state.cumulative_revenue if simulated_months else initial_state.cumulative_revenue
+    clv_arr = [simulated_month.clv for simulated_month in simulated_months]
+
+    return SimulationResult(cumulative_revenue, [simulated_month.revenue for simulated_month in simulated_months],
+                            clv_arr, sum(clv_arr)/len(clv_arr) if clv_arr else 0,
+                            [simulated_month.churn for simulated_month in simulated_months],
+                            [simulated_month.customers for simulated_month in simulated_months],
+                            [simulated_month.state for simulated_month in simulated_months])
+
+def calculate_cumulative_revenue(employee_allocation,MONTHS):
+    result = simulate(employee_allocation, MONTHS)
+    return result.cumulative_revenue, result.monthly_revenue
+
+def calculate_avg_clv(employee_allocation,MONTHS):
+    result = simulate(employee_allocation, MONTHS)
+    return result.avg_clv, result.monthly_clv
+
+# Churn rate by number of support agents, up to the CSAT cap of 100
+CHURN_RATES_BY_SUPPORT = np.array([BASE_CHURN_RATE * ((1-CSAT_CHURN_REDUCTION) ** ((min(INITIAL_CSAT + support, 100) - INITIAL_CSAT) / 1))
+                                   for support in range(100 - INITIAL_CSAT + 1)])
+MANAGED_MONTH_REVENUE_ARRAY = np.array(MANAGED_MONTH_REVENUES, dtype=np.float64)
+
+# Advance a batch of managed-month histograms, shape (population, 7), by one month of
+# allocations, shape (population, 3). Same steps as advance_managed_histogram; given a numpy
+# Generator as rng, churned customers are drawn binomially and new customers from a Poisson
+# distribution around the deterministic counts instead.
+def advance_managed_histograms(managed_histograms, allocations, rng=None):
+    new_business = allocations[:, 0]
+    account_managers = allocations[:, 1]
+    support = allocations[:, 2]
+
+    # Calculate churn rate (CSAT is capped at 100)
+    churn_rate = CHURN_RATES_BY_SUPPORT[np.minimum(support, 100 - INITIAL_CSAT)]
+
+    # Calculate new customers
+    new_customers = ORGANIC_GROWTH + (new_business * 5)
+    if rng is not None:
+        new_customers = rng.poisson(new_customers)
+
+    # Apply churn, dropping customers from the lowest levels first
+    if rng is None:
+        churned_customers = (managed_histograms.sum(axis=1) * churn_rate).astype(np.int64)
+    else:
+        churned_customers = rng.binomial(managed_histograms.sum(axis=1), churn_rate)
+    # Work level by level on a (7, population) copy so every level is contiguous in memory
+    histograms = managed_histograms.T.copy()
+    remaining_churn = churned_customers.copy()
+    for level in range(MAX_MANAGED_MONTHS + 1):
+        dropped = np.minimum(histograms[level], remaining_churn)
+        histograms[level] -= dropped
+        remaining_churn -= dropped
+
+    # New customers join unmanaged
+    histograms[0] += new_customers
+
+    # Account managers take the highest levels; everyone else is reset to unmanaged
+    accounts_managed = np.minimum(histograms.sum(axis=0), account_managers * 25)
+    advanced_histograms = np.zeros_like(histograms)
+    for level in range(MAX_MANAGED_MONTHS, -1, -1):
+        managed = np.minimum(histograms[level], accounts_managed)
+        accounts_managed -= managed
+        advanced_histograms[min(level + 1, MAX_MANAGED_MONTHS)] += managed
+        advanced_histograms[0] += histograms[level] - managed
+    advanced_histograms = advanced_histograms.T
+
+    return advanced_histograms, churn_rate, churned_customers
+
+# Evaluate a whole population of allocations, shape (population, months, 3), in one pass.
+# Returns cumulative revenue (population,), monthly revenue (population, months) and
+# average CLV (population,). Agrees with calculate_cumulative_revenue / calculate_avg_clv
+# up to floating point summation order.
+def evaluate_allocations(allocations):
+    allocations = np.asarray(allocations, dtype=np.int64)
+    population, months, _ = allocations.shape
+
+    managed_histograms = np.zeros((population, MAX_MANAGED_MONTHS + 1), dtype=np.int64)
+    managed_histograms[:, 0] = INITIAL_CUSTOMERS
+    monthly_revenue = np.empty((population, months), dtype=np.float64)
+    clv_total = np.zeros(population, dtype=np.float64)
+
+    for month in range(months):
+        managed_histograms, churn_rate, _ = advance_managed_histograms(managed_histograms, allocations[:, month])
+        monthly_revenue[:, month] = managed_histograms @ MANAGED_MONTH_REVENUE_ARRAY
+        clv_total += calculate_clv(monthly_revenue[:, month] / managed_histograms.sum(axis=1), churn_rate)
+
+    return monthly_revenue.sum(axis=1), monthly_revenue, clv_total / months
+
+# Resume a batch of allocations, shape (population, months, 3), from their states at the start
+# of start_month: managed-month histograms (population, 7) and cumulative revenues (population,).
+# Returns the final cumulative revenues together with the histograms and cumulative revenues at
+# the start of every checkpoint month (multiples of checkpoint_every) from start_month on, with
+# shapes (population, checkpoints, 7) and (population, checkpoints).
+def resume_allocations(allocations, start_month, managed_histograms, cumulative_revenues, checkpoint_every):
+    allocations = np.asarray(allocations, dtype=np.int64)
+    population, months, _ = allocations.shape
+
+    managed_histograms = np.asarray(managed_histograms, dtype=np.int64)
+    cumulative_revenues = np.array(cumulative_revenues, dtype=np.float64)
+    checkpoint_histograms = []
+    checkpoint_revenues = []
+
+    for month in range(start_month, months):
+        if month % checkpoint_every == 0:
+            checkpoint_histograms.append(managed_histograms)
+            checkpoint_revenues.append(cumulative_revenues.copy())
+        managed_histograms, _, _ = advance_managed_histograms(managed_histograms, allocations[:, month])
+        cumulative_revenues += managed_histograms @ MANAGED_MONTH_REVENUE_ARRAY
+
+    return (cumulative_revenues,
+            np.stack(checkpoint_histograms, axis=1) if checkpoint_histograms else np.empty((population, 0, MAX_MANAGED_MONTHS + 1), dtype=np.int64),
+            np.stack(checkpoint_revenues, axis=1) if checkpoint_revenues else np.empty((population, 0), dtype=np.float64))
+
+# Replicates per plan in the stochastic mode and the percentiles reported as bands
+STOCHASTIC_REPLICATES = 1000
+BAND_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Simulate every plan in allocations, shape (population, months, 3), replicates times with
+# binomial churn and Poisson new customers drawn from one Generator seeded with seed (an int or
+# a numpy SeedSequence), so a seed always reproduces the same replicates. Returns monthly revenue
+# and monthly CLV, shape (population, replicates, months).
+def simulate_replicates(allocations, replicates=STOCHASTIC_REPLICATES, seed=0):
+    allocations = np.asarray(allocations, dtype=np.int64)
+    population, months, _ = allocations.shape
+    rng = np.random.default_rng(seed)
+    replicate_allocations = np.repeat(allocations, replicates, axis=0)
+
+    managed_histograms = np.zeros((population * replicates, MAX_MANAGED_MONTHS + 1), dtype=np.int64)
+    managed_histograms[:, 0] = INITIAL_CUSTOMERS
+    monthly_revenue = np.empty((population * replicates, months), dtype=np.float64)
+    monthly_clv = np.empty((population * replicates, months), dtype=np.float64)
+
+    for month in range(months):
+        managed_histograms, churn_rate, _ = advance_managed_histograms(managed_histograms, replicate_allocations[:, month], rng)
+        monthly_revenue[:, month] = managed_histograms @ MANAGED_MONTH_REVENUE_ARRAY
+        monthly_clv[:, month] = calculate_clv(monthly_revenue[:, month] / managed_histograms.sum(axis=1), churn_rate)
+
+    return (monthly_revenue.reshape(population, replicates, months),
+            monthly_clv.reshape(population, replicates, months))
+
+# Cumulative revenue of every replicate, shape (population, replicates), drawn like
+# simulate_replicates without keeping the monthly series
+def replicate_cumulative_revenues(allocations, replicates=STOCHASTIC_REPLICATES, seed=0):
+    allocations = np.asarray(allocations, dtype=np.int64)
+    population, months, _ = allocations.shape
+    rng = np.random.default_rng(seed)
+    replicate_allocations = np.repeat(allocations, replicates, axis=0)
+
+    managed_histograms = np.zeros((population * replicates, MAX_MANAGED_MONTHS + 1), dtype=np.int64)
+    managed_histograms[:, 0] = INITIAL_CUSTOMERS
+    cumulative_revenues = np.zeros(population * replicates, dtype=np.float64)
+
+    for month in range(months):
+        managed_histograms, _, _ = advance_managed_histograms(managed_histograms, replicate_allocations[:, month], rng)
+        cumulative_revenues += managed_histograms @ MANAGED_MONTH_REVENUE_ARRAY
+
+    return cumulative_revenues.reshape(population, replicates)
+
+# Percentile bands (percentile -> values) of one plan's monthly revenue (months,), monthly CLV
+# (months,) and cumulative revenue over its replicates
+StochasticBands = namedtuple("StochasticBands", ["monthly_revenue", "monthly_clv", "cumulative_revenue"])
+
+def stochastic_bands(employee_allocation, MONTHS, replicates=STOCHASTIC_REPLICATES, seed=0, percentiles=BAND_PERCENTILES):
+    monthly_revenue, monthly_clv = simulate_replicates([employee_allocation[:MONTHS]], replicates, seed)
+    cumulative_revenue = monthly_revenue[0].sum(axis=1)
+    return StochasticBands({percentile: np.percentile(monthly_revenue[0], percentile, axis=0) for percentile in percentiles},
+                           {percentile: np.percentile(monthly_clv[0], percentile, axis=0) for percentile in percentiles},
+                           {percentile: float(np.percentile(cumulative_revenue, percentile)) for percentile in percentiles})
 
 # Example usage:
 allocations = {
@@ -207,11 +392,26 @@ allocations_old = {
                   [0, 5, 15], [6, 1, 13], [4, 5, 11], [6, 12, 2], [5, 6, 9], [0, 4, 16], [5, 6, 9], [8, 1, 11], [14, 2, 4], [3, 7, 10], [12, 2, 6], [3, 7, 10], [6, 1, 13], [14, 5, 1], [7, 4, 9], [16, 4, 0], [20, 0, 0], [9, 4, 7], [6, 4, 10], [2, 1, 17], [6, 0, 14], [7, 10, 3], [18, 2, 0], [19, 0, 1], [16, 3, 1], [4, 13, 3], [1, 11, 8], [11, 9, 0], [7, 13, 0], [13, 2, 5], [19, 1, 0], [16, 1, 3], [9, 3, 8], [1, 13, 6], [2, 17, 1], [3, 17, 0], [0, 16, 4], [6, 11, 3], [12, 2, 6], [5, 11, 4], [12, 7, 1], [0, 7, 13], [5, 13, 2], [2, 0, 18], [6, 3, 11], [0, 14, 6], [13, 5, 2], [1, 17, 2], [14, 5, 1], [20, 0, 0], [9, 10, 1], [8, 0, 12], [1, 1, 18], [17, 0, 3], [0, 9, 11], [5, 3, 12], [8, 5, 7], [20, 0, 0], [20, 0, 0], [9, 2, 9]],
 }
 
-MONTHS  = 24
-print("Months | Allocation | Revenue | Lifetime Value |")
-for allocation in allocations:
-    cumlative_revenue, monthly_revenue_arr = calculate_cumulative_revenue(allocations[allocation][:MONTHS],MONTHS)
-    lifetime_value,lifetime_value_arr = calculate_avg_clv(allocations[allocation][:MONTHS],MONTHS)
-    print(f"{MONTHS} | {allocation} | ${cumlative_revenue:,.2f} | ${lifetime_value:,.2f} |")
-    open(f"{allocation}_montlhy_revenue.txt","w").write(str(monthly_revenue_arr))
-    open(f"{allocation}_lifetime_value.txt","w").write(str(lifetime_value_arr))
+if __name__ == "__main__":
+    from evaluation_cache import EvaluationCache, evaluation_key, model_version
+    from results import ResultsStore
+
+    store = ResultsStore()
+    MONTHS  = 24
+
+    # Simulate only the plans the evaluation cache has not seen with this version of the model
+    metrics = ["cumulative_revenue", "monthly_revenue", "monthly_clv"]
+    plans = [allocations[allocation][:MONTHS] for allocation in allocations]
+    def simulate_plans(indices):
+        results = [simulate(plans[index], MONTHS) for index in indices]
+        return {metric: [getattr(result, metric) for result in results] for metric in metrics}
+    evaluations = EvaluationCache().evaluate([evaluation_key(model_version(__file__), None, plan) for plan in plans],
+                                             metrics, simulate_plans)
+
+    print("Months | Allocation | Revenue | Lifetime Value |")
+    for index, allocation in enumerate(allocations):
+        cumulative_revenue = evaluations["cumulative_revenue"][index][0]
+        monthly_revenue = evaluations["monthly_revenue"][index]
+        monthly_clv = evaluations["monthly_clv"][index]
+        print(f"{MONTHS} | {allocation} | ${cumulative_revenue:,.2f} | ${sum(monthly_clv.tolist())/len(monthly_clv):,.2f} |")
+        store.append(allocation, MONTHS, {"monthly_revenue": monthly_revenue, "monthly_clv": monthly_clv})
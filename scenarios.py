@@ -0,0 +1,178 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque, namedtuple
+
+import numpy as np
+
+from revenue import evaluate_allocations, repeat_plan
+
+# Worker processes, plans simulated together in one batched call, and chunks in flight per
+# worker; plans are read lazily, so at most workers * SCENARIO_CHUNKS_IN_FLIGHT chunks are in memory
+SCENARIO_WORKERS = os.cpu_count()
+SCENARIO_CHUNK_SIZE = 1000
+SCENARIO_CHUNKS_IN_FLIGHT = 2
+
+# Columns of a CSV plan file: one row per month, consecutive rows with the same plan name form a plan
+PLAN_COLUMNS = ["plan", "new_business", "account_managers", "support"]
+RESULT_COLUMNS = ["plan", "months", "cumulative_revenue", "avg_clv"]
+
+# Stands in for the allocations of a plan that could not be parsed, so that evaluate_chunk skips
+# it with the reason instead of the whole batch failing
+UnreadablePlan = namedtuple("UnreadablePlan", ["reason"])
+
+# (name, allocations) of every plan in a JSON Lines file: each line is either a list of monthly
+# allocations or an object with "allocations" and optionally "name"; anything else is passed on
+# as the plan for evaluate_chunk to reject, and a line that is not JSON as an UnreadablePlan
+def read_jsonl_plans(file):
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield f"plan {line_number}", UnreadablePlan(f"line {line_number} is not valid JSON ({error})")
+            continue
+        if isinstance(record, dict):
+            yield record.get("name", f"plan {line_number}"), record.get("allocations")
+        else:
+            yield f"plan {line_number}", record
+
+# (name, allocations) of every plan in a CSV file with PLAN_COLUMNS; a plan with a missing or
+# non-integer headcount is passed on as an UnreadablePlan
+def read_csv_plans(file):
+    rows = csv.DictReader(file)
+    for name, plan_rows in itertools.groupby(rows, key=lambda row: row.get("plan")):
+        try:
+            plan = [[int(row["new_business"]), int(row["account_managers"]), int(row["support"])] for row in plan_rows]
+        except (KeyError, TypeError, ValueError) as error:
+            plan = UnreadablePlan(f"unreadable row ({error!r})")
+        yield name, plan
+
+# Why a plan cannot be evaluated, or None if it is a non-empty list of months of 3 non-negative
+# whole headcounts
+def plan_error(plan):
+    if isinstance(plan, UnreadablePlan):
+        return plan.reason
+    if not isinstance(plan, list) or not plan:
+        return "not a non-empty list of monthly allocations"
+    for month, allocation in enumerate(plan, 1):
+        if (not isinstance(allocation, list) or len(allocation) != 3
+                or not all(isinstance(count, int) and not isinstance(count, bool) and count >= 0 for count in allocation)):
+            return f"month {month} is not 3 non-negative whole headcounts"
+    return None
+
+# Evaluate one chunk of plans over every horizon (None for each plan's own length) with the batched
+# simulator, grouping plans of the same length into one call. Plans shorter than a horizon are
+# repeated to fill it if repeat is set and skipped otherwise; invalid plans (see plan_error) are
+# skipped. Returns the result rows in plan order and the skipped plans with the reason.
+def evaluate_chunk(task):
+    names, plans, horizons, repeat, monthly = task
+    rows = {}
+    skipped = []
+    errors = {index: plan_error(plan) for index, plan in enumerate(plans)}
+    skipped.extend((names[index], error) for index, error in errors.items() if error is not None)
+    for horizon_index, horizon in enumerate(horizons):
+        groups = {}
+        for index, plan in enumerate(plans):
+            if errors[index] is not None:
+                continue
+            months = len(plan) if horizon is None else horizon
+            if len(plan) < months and not repeat:
+                skipped.append((names[index], f"shorter than {months} months (use --repeat to repeat it)"))
+                continue
+            groups.setdefault(months, []).append(index)
+        for months, indices in groups.items():
+            cumulative_revenues, monthly_revenues, avg_clvs = evaluate_allocations(
+                np.array([list(repeat_plan(plans[index], months)) for index in indices], dtype=np.int64))
+            for position, index in enumerate(indices):
+                row = [names[index], months, float(cumulative_revenues[position]), float(avg_clvs[position])]
+                if monthly:
+                    row.append(monthly_revenues[position].tolist())
+                rows[index, horizon_index] = row
+    return [rows[key] for key in sorted(rows)], skipped
+
+# Chunks of chunk_size (names, plans) from an iterator of (name, allocations)
+def plan_chunks(plans, chunk_size):
+    plans = iter(plans)
+    while True:
+        chunk = list(itertools.islice(plans, chunk_size))
+        if not chunk:
+            return
+        yield [name for name, _ in chunk], [plan for _, plan in chunk]
+
+# Results of evaluate_chunk for every chunk, in input order, keeping at most `window` chunks in flight
+def evaluate_chunks(tasks, pool, window):
+    if pool is None:
+        yield from map(evaluate_chunk, tasks)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(evaluate_chunk, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+# Evaluate plans (an iterable of (name, allocations)) over the horizons and write one row per plan
+# and horizon to output as soon as its chunk is done, as CSV or JSON Lines. Returns the number of
+# rows written.
+def run_scenarios(plans, output, horizons=(None,), output_format="csv", monthly=False, repeat=False,
+                  workers=SCENARIO_WORKERS, chunk_size=SCENARIO_CHUNK_SIZE):
+    horizons = list(horizons)
+    columns = RESULT_COLUMNS + (["monthly_revenue"] if monthly else [])
+    writer = csv.writer(output) if output_format == "csv" else None
+    if writer is not None:
+        writer.writerow(columns)
+
+    tasks = ((names, chunk, horizons, repeat, monthly) for names, chunk in plan_chunks(plans, chunk_size))
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    written = 0
+    try:
+        for rows, skipped in evaluate_chunks(tasks, pool, workers * SCENARIO_CHUNKS_IN_FLIGHT):
+            for name, reason in skipped:
+                print(f"Skipped {name!r}: {reason}", file=sys.stderr)
+            for row in rows:
+                if writer is not None:
+                    writer.writerow((row[:4] + [json.dumps(row[4])]) if monthly else row)
+                else:
+                    output.write(json.dumps(dict(zip(columns, row))) + "\n")
+            output.flush()
+            written += len(rows)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate allocation plans with the batched simulator and stream one "
+                                                 "result row per plan and horizon.")
+    parser.add_argument("plans", nargs="?", default="-",
+                        help="JSON Lines (.jsonl) or CSV (.csv) file of plans, or - for stdin (default)")
+    parser.add_argument("--input-format", choices=["jsonl", "csv"],
+                        help="format of the plans (default: from the file extension, jsonl for stdin)")
+    parser.add_argument("--months", type=int, nargs="+",
+                        help="horizons to evaluate every plan over (default: each plan's own length)")
+    parser.add_argument("--repeat", action="store_true", help="repeat plans shorter than a horizon instead of skipping them")
+    parser.add_argument("--output-format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--monthly", action="store_true", help="include the monthly revenue series")
+    parser.add_argument("--workers", type=int, default=SCENARIO_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=SCENARIO_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    input_format = args.input_format or ("csv" if args.plans.endswith(".csv") else "jsonl")
+    read_plans = read_csv_plans if input_format == "csv" else read_jsonl_plans
+    file = sys.stdin if args.plans == "-" else open(args.plans, newline="" if input_format == "csv" else None)
+    with file:
+        try:
+            run_scenarios(read_plans(file), sys.stdout, args.months or [None], args.output_format, args.monthly,
+                          args.repeat, args.workers, args.chunk_size)
+        except BrokenPipeError:
+            # The reader of the output (e.g. head) has gone; stop without a traceback
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
@@ -0,0 +1,108 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Global sensitivity analysis of a batched model: model(parameter_sets) takes a parameter set
+# of (sets,) arrays (see parameters.py) and returns the metric for every set, shape (sets,).
+# The analysed constants are sampled jointly within perturbation_factor of their values in
+# parameters; all other constants keep their values.
+
+# Parameter sets handed to the model at a time
+SENSITIVITY_BATCH_SIZE = 100000
+
+# Fractions of the samples at which the Sobol indices are re-estimated to show convergence
+CONVERGENCE_FRACTIONS = (0.125, 0.25, 0.5, 1)
+
+# Bootstrap resamples for the Sobol confidence intervals (95%)
+BOOTSTRAP_RESAMPLES = 200
+
+SobolResult = namedtuple("SobolResult", ["constants", "first_order", "total_order", "first_order_confidence",
+                                         "total_order_confidence", "sample_sizes", "first_order_history",
+                                         "total_order_history"])
+
+MorrisResult = namedtuple("MorrisResult", ["constants", "mu", "mu_star", "sigma"])
+
+# Evaluate the model on rows of unit samples, shape (samples, constants) with values in [0, 1]
+# mapping to -perturbation_factor..+perturbation_factor, in batches of batch_size
+def evaluate_unit_samples(model, parameters, constants, unit_samples, perturbation_factor, batch_size):
+    values = np.array([getattr(parameters, constant) for constant in constants], dtype=np.float64)
+    samples = values * (1 + perturbation_factor * (2 * unit_samples - 1))
+    outputs = np.empty(len(samples))
+    for start in range(0, len(samples), batch_size):
+        batch = samples[start:start + batch_size]
+        fields = {field: np.full(len(batch), value, dtype=np.float64) for field, value in parameters._asdict().items()}
+        fields.update({constant: batch[:, index] for index, constant in enumerate(constants)})
+        outputs[start:start + batch_size] = model(type(parameters)(**fields))
+    return outputs
+
+# First-order (Saltelli 2010) and total-order (Jansen) Sobol indices from the model outputs
+# on the A and B sample matrices, shape (samples,), and on A with column i taken from B,
+# shape (samples, constants). Outputs are centred first, since the first-order estimator's
+# variance grows with the square of their mean.
+def sobol_estimates(outputs_a, outputs_b, outputs_ab):
+    mean = np.mean(np.concatenate([outputs_a, outputs_b]))
+    outputs_a, outputs_b, outputs_ab = outputs_a - mean, outputs_b - mean, outputs_ab - mean
+    variance = np.var(np.concatenate([outputs_a, outputs_b]))
+    first_order = np.mean(outputs_b[:, None] * (outputs_ab - outputs_a[:, None]), axis=0) / variance
+    total_order = 0.5 * np.mean((outputs_a[:, None] - outputs_ab) ** 2, axis=0) / variance
+    return first_order, total_order
+
+# Sobol first- and total-order indices of the constants with 95% bootstrap confidence intervals,
+# re-estimated on growing prefixes of the samples (CONVERGENCE_FRACTIONS) as a convergence
+# diagnostic. Costs samples * (constants + 2) model evaluations.
+def sobol_indices(model, parameters, constants, samples, perturbation_factor=0.1, rng=None,
+                  batch_size=SENSITIVITY_BATCH_SIZE):
+    rng = np.random.default_rng() if rng is None else rng
+    constant_count = len(constants)
+    unit_a = rng.random((samples, constant_count))
+    unit_b = rng.random((samples, constant_count))
+    unit_ab = np.repeat(unit_a[:, None, :], constant_count, axis=1)
+    unit_ab[:, np.arange(constant_count), np.arange(constant_count)] = unit_b
+
+    outputs = evaluate_unit_samples(model, parameters, constants,
+                                    np.concatenate([unit_a, unit_b, unit_ab.reshape(-1, constant_count)]),
+                                    perturbation_factor, batch_size)
+    outputs_a = outputs[:samples]
+    outputs_b = outputs[samples:2 * samples]
+    outputs_ab = outputs[2 * samples:].reshape(samples, constant_count)
+
+    first_order, total_order = sobol_estimates(outputs_a, outputs_b, outputs_ab)
+
+    bootstrap_first = np.empty((BOOTSTRAP_RESAMPLES, constant_count))
+    bootstrap_total = np.empty((BOOTSTRAP_RESAMPLES, constant_count))
+    for resample in range(BOOTSTRAP_RESAMPLES):
+        rows = rng.integers(0, samples, size=samples)
+        bootstrap_first[resample], bootstrap_total[resample] = sobol_estimates(outputs_a[rows], outputs_b[rows], outputs_ab[rows])
+
+    sample_sizes = [max(2, int(samples * fraction)) for fraction in CONVERGENCE_FRACTIONS]
+    history = [sobol_estimates(outputs_a[:size], outputs_b[:size], outputs_ab[:size]) for size in sample_sizes]
+
+    return SobolResult(list(constants), first_order, total_order,
+                       1.96 * bootstrap_first.std(axis=0), 1.96 * bootstrap_total.std(axis=0),
+                       sample_sizes, np.array([first for first, _ in history]), np.array([total for _, total in history]))
+
+# Morris elementary effects of the constants from trajectories that start at a random point of a
+# grid with the given number of levels and move one constant at a time, in random order, by
+# levels / (2 * (levels - 1)) of its range. Costs trajectories * (constants + 1) model evaluations.
+def morris_elementary_effects(model, parameters, constants, trajectories, perturbation_factor=0.1, levels=4, rng=None,
+                              batch_size=SENSITIVITY_BATCH_SIZE):
+    rng = np.random.default_rng() if rng is None else rng
+    constant_count = len(constants)
+    rows = np.arange(trajectories)
+    delta = levels / (2 * (levels - 1))
+
+    # Start points leave room for one step of delta
+    starts = rng.integers(0, levels // 2, size=(trajectories, constant_count)) / (levels - 1)
+    order = np.argsort(rng.random((trajectories, constant_count)), axis=1)
+    points = np.repeat(starts[:, None, :], constant_count + 1, axis=1)
+    for step in range(constant_count):
+        points[rows, step + 1:, order[:, step]] += delta
+
+    outputs = evaluate_unit_samples(model, parameters, constants, points.reshape(-1, constant_count),
+                                    perturbation_factor, batch_size).reshape(trajectories, constant_count + 1)
+
+    effects = np.empty((trajectories, constant_count))
+    for step in range(constant_count):
+        effects[rows, order[:, step]] = (outputs[:, step + 1] - outputs[:, step]) / delta
+
+    return MorrisResult(list(constants), effects.mean(axis=0), np.abs(effects).mean(axis=0), effects.std(axis=0))
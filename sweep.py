@@ -0,0 +1,99 @@
+import csv
+import hashlib
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+from parameters import stack_parameters
+from q_3 import DEFAULT_PARAMETERS, simulate_parameter_sets
+
+# Worker processes and the number of grid cells simulated together in one batched call
+SWEEP_WORKERS = os.cpu_count()
+SWEEP_CHUNK_SIZE = 2000
+
+# Axis name for the simulated horizon; every other axis names a constant of the parameter set
+HORIZON_AXIS = "MONTHS"
+
+# Short digest of an allocation plan, so cached cells are only reused for the same plan
+def plan_digest(allocations):
+    return hashlib.blake2b(np.asarray(allocations, dtype=np.int64).tobytes(), digest_size=8).hexdigest()
+
+# Column names of the results table: one row per cell with the plan, the horizon and the whole
+# parameter set, so a cell is identified by its row no matter which constants were swept
+def sweep_columns(parameters):
+    return ["plan", "plan_digest", HORIZON_AXIS] + list(parameters._fields) + ["cumulative_revenue"]
+
+# Identity of a cell in the results table; values are compared as float reprs
+def cell_key(plan, digest, months, parameter_values):
+    return (plan, digest, int(months)) + tuple(repr(float(value)) for value in parameter_values)
+
+# Keys of the cells already in the results table at path
+def completed_cells(path, parameters):
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as file:
+        reader = csv.DictReader(file)
+        return {cell_key(row["plan"], row["plan_digest"], row[HORIZON_AXIS], [row[field] for field in parameters._fields])
+                for row in reader}
+
+# Simulate one chunk of cells that share a plan and horizon; returns the rows for the results table
+def simulate_chunk(task):
+    plan, digest, allocations, months, parameter_sets = task
+    cumulative_revenues = simulate_parameter_sets(allocations, months, stack_parameters(parameter_sets))
+    return [[plan, digest, months] + [repr(float(value)) for value in parameter_set] + [repr(float(revenue))]
+            for parameter_set, revenue in zip(parameter_sets, cumulative_revenues.tolist())]
+
+# Run the Cartesian product of the axes (constant name or HORIZON_AXIS -> values) for every plan
+# (name -> monthly allocations) and append one row per cell to the CSV table at path as chunks
+# finish. Cells already in the table are skipped, so extending an axis only simulates the new
+# points. Without a horizon axis each plan is simulated over its full length.
+def run_sweep(axes, plans, path, parameters=DEFAULT_PARAMETERS, workers=SWEEP_WORKERS, chunk_size=SWEEP_CHUNK_SIZE):
+    for axis in axes:
+        if axis != HORIZON_AXIS and axis not in parameters._fields:
+            raise ValueError(f"Unknown sweep axis {axis!r}")
+    constant_axes = [axis for axis in axes if axis != HORIZON_AXIS]
+    completed = completed_cells(path, parameters)
+
+    # Pending cells, grouped into chunks of the same plan and horizon
+    tasks = []
+    for plan, allocations in plans.items():
+        digest = plan_digest(allocations)
+        for months in axes.get(HORIZON_AXIS, [len(allocations)]):
+            if months > len(allocations):
+                raise ValueError(f"Plan {plan!r} has {len(allocations)} months, fewer than the horizon {months}")
+            pending = []
+            for values in itertools.product(*(axes[axis] for axis in constant_axes)):
+                parameter_set = parameters._replace(**dict(zip(constant_axes, values)))
+                if cell_key(plan, digest, months, parameter_set) not in completed:
+                    pending.append(parameter_set)
+            for start in range(0, len(pending), chunk_size):
+                tasks.append((plan, digest, allocations, months, pending[start:start + chunk_size]))
+
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="") as file:
+        writer = csv.writer(file)
+        if write_header:
+            writer.writerow(sweep_columns(parameters))
+        pool = multiprocessing.Pool(workers) if workers > 1 and len(tasks) > 1 else None
+        results = map(simulate_chunk, tasks) if pool is None else pool.imap_unordered(simulate_chunk, tasks)
+        for rows in results:
+            writer.writerows(rows)
+            file.flush()
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return sum(len(task[4]) for task in tasks)
+
+if __name__ == "__main__":
+    from revenue import allocations
+
+    # Churn rate x managed revenue uplift x horizon for the stored 120 month optimum
+    simulated = run_sweep({"BASE_CHURN_RATE": np.linspace(0.05, 0.15, 11).tolist(),
+                           "REVENUE_INCREASE_RATE": np.linspace(0.1, 0.3, 11).tolist(),
+                           HORIZON_AXIS: [12, 24, 36, 48, 60, 120]},
+                          {"120 Months optimized": allocations["120 Months optimized"]},
+                          "graphs/data/sweep.csv")
+    print(f"Simulated {simulated} new cells")